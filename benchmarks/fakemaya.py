@@ -0,0 +1,1098 @@
+"""
+Fake Maya
+
+In memory stand-in for the subset of ``maya.cmds`` and ``maya.api.OpenMaya``
+used by mamtools. Scenes are a dag of :class:`Node` objects, meshes keep
+points and face arrays as numpy arrays and tweaks on the ``pnts`` plug.
+Every command call is counted in ``FakeCmds.calls``.
+
+Call :func:`install` before importing mamtools modules, mampy and PySide
+are replaced by stubs from :mod:`stubs`. :func:`install_mampy` swaps the
+mampy component calls of imported tool modules for fakes reading the
+selection of the fake scene.
+"""
+import re
+import sys
+import types
+import itertools
+import collections
+
+import numpy as np
+
+import stubs
+
+
+class Node(object):
+    """
+    Dag node, `attrs` holds plain attribute values.
+    """
+
+    _uuids = itertools.count()
+
+    def __init__(self, name, node_type, parent=None):
+        self.name = name
+        self.type = node_type
+        self.parent = parent
+        self.children = []
+        self.attrs = {'visibility': True}
+        self.uuid = 'FAKE-{:012d}'.format(next(self._uuids))
+        self.intermediate = False
+        self.mesh = None
+
+    @property
+    def path(self):
+        parts, node = [], self
+        while node is not None and node.parent is not None:
+            parts.append(node.name)
+            node = node.parent
+        return '|' + '|'.join(reversed(parts))
+
+    @property
+    def is_shape(self):
+        return self.type in SHAPE_TYPES
+
+    def walk(self):
+        """Yield node and descendants depth first in sibling order."""
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.children))
+
+
+SHAPE_TYPES = {'mesh', 'nurbsCurve', 'camera', 'pointLight', 'directionalLight',
+               'spotLight', 'locator'}
+
+
+class Mesh(object):
+    """
+    Mesh data for a shape node, points are without tweaks.
+    """
+
+    def __init__(self, points, counts, connects):
+        self.points = np.array(points, dtype=float).reshape(-1, 3)
+        self.counts = np.array(counts, dtype=int)
+        self.connects = np.array(connects, dtype=int)
+        self.tweaks = {}
+        self._edges = None
+
+        # Uv set name to (u, v, uv id per face-vertex), one uv per vertex.
+        self.uvs = {'map1': (self.points[:, 0].copy(), self.points[:, 2].copy(),
+                             self.connects.copy())}
+
+    def copy(self):
+        mesh = Mesh(self.final_points(), self.counts, self.connects)
+        mesh.uvs = dict(self.uvs)
+        return mesh
+
+    def final_points(self):
+        points = self.points.copy()
+        if self.tweaks:
+            indices = np.fromiter(self.tweaks.keys(), dtype=int)
+            points[indices] += np.array(list(self.tweaks.values()), dtype=float)
+        return points
+
+    def face_offsets(self):
+        return np.r_[0, np.cumsum(self.counts)]
+
+    def edges(self):
+        """
+        Return (n, 2) edge vertex pairs and the edge of each face-vertex.
+        """
+        if self._edges is None:
+            self._edges = self._build_edges()
+        return self._edges
+
+    def _build_edges(self):
+        offsets = self.face_offsets()
+        following = np.arange(len(self.connects)) + 1
+        following[offsets[1:] - 1] = offsets[:-1]
+        pairs = np.sort(np.c_[self.connects, self.connects[following]], axis=1)
+        if not len(pairs):
+            return pairs.reshape(0, 2), np.zeros(0, dtype=int)
+        edges, face_edges = np.unique(pairs, axis=0, return_inverse=True)
+        return edges, face_edges.ravel()
+
+    def _rebuild(self, points, counts, connects):
+        """
+        Set new faces, dropping vertices no face uses.
+        """
+        used, connects = np.unique(np.asarray(connects, dtype=int), return_inverse=True)
+        self.__init__(points[used], counts, connects.ravel())
+
+    def delete_faces(self, faces):
+        """
+        Remove `faces` and the vertices no face uses anymore.
+        """
+        keep = np.ones(len(self.counts), dtype=bool)
+        keep[faces] = False
+        self._rebuild(self.final_points(), self.counts[keep],
+                      self.connects[np.repeat(keep, self.counts)])
+
+    def delete_edges(self, edges):
+        """
+        Join the faces on both sides of `edges` into one face per group.
+
+        Groups must be disks, their border becomes the new face.
+        """
+        pairs, face_edges = self.edges()
+        offsets = self.face_offsets()
+        face_of = np.repeat(np.arange(len(self.counts)), self.counts)
+        removed = np.zeros(len(pairs), dtype=bool)
+        removed[edges] = True
+
+        # Faces on both sides of a removed edge end up with one label.
+        sides = np.flatnonzero(removed[face_edges])
+        sides = sides[np.argsort(face_edges[sides], kind='mergesort')]
+        inner = face_edges[sides][1:] == face_edges[sides][:-1]
+        a, b = face_of[sides[:-1][inner]], face_of[sides[1:][inner]]
+        labels = np.arange(len(self.counts))
+        while len(a) and not (labels[a] == labels[b]).all():
+            low = np.minimum(labels[a], labels[b])
+            np.minimum.at(labels, a, low)
+            np.minimum.at(labels, b, low)
+            labels = labels[labels]
+        joined = (np.bincount(labels, minlength=len(labels)) > 1)[labels]
+
+        following = np.arange(len(self.connects)) + 1
+        following[offsets[1:] - 1] = offsets[:-1]
+        members = np.flatnonzero(joined[face_of] & ~removed[face_edges])
+        members = members[np.argsort(labels[face_of[members]], kind='mergesort')]
+        splits = np.flatnonzero(np.diff(labels[face_of[members]])) + 1
+        counts, connects = [], []
+        for group in np.split(members, splits) if len(members) else []:
+            after = dict(zip(self.connects[group].tolist(), self.connects[following[group]].tolist()))
+            vertex = start = int(self.connects[group[0]])
+            while True:
+                connects.append(vertex)
+                vertex = after[vertex]
+                if vertex == start:
+                    break
+            counts.append(len(connects) - sum(counts))
+        # Vertex ids stay, like polyDelEdge without cleaning vertices.
+        self.__init__(self.final_points(), np.r_[self.counts[~joined], counts].astype(int),
+                      np.r_[self.connects[~joined[face_of]], connects].astype(int))
+
+    def merge_vertices(self, vertices, distance):
+        """
+        Merge `vertices` that round to the same point at `distance`.
+        """
+        points = self.final_points()
+        target = np.arange(len(points))
+        vertices = np.asarray(vertices, dtype=int)
+        cells = np.round(points[vertices] / max(distance, 1e-9))
+        _, first, inverse = np.unique(cells, axis=0, return_index=True, return_inverse=True)
+        target[vertices] = vertices[first][inverse.ravel()]
+
+        # Drop face-vertices repeating the previous one, then small faces.
+        connects = target[self.connects]
+        offsets = self.face_offsets()
+        previous = np.arange(len(connects)) - 1
+        previous[offsets[:-1]] = offsets[1:] - 1
+        face_of = np.repeat(np.arange(len(self.counts)), self.counts)
+        keep = connects != connects[previous]
+        counts = np.bincount(face_of[keep], minlength=len(self.counts))
+        keep &= (counts > 2)[face_of]
+        self._rebuild(points, counts[counts > 2], connects[keep])
+
+
+class FakeScene(object):
+    """
+    Dag scene with selection and global poly display options.
+    """
+
+    def __init__(self):
+        self.world = Node('', 'world')
+        self.paths = {}
+        self.uuids = {}
+        self.selection = []
+        self.poly_options = collections.defaultdict(bool)
+
+    def create(self, name, node_type='transform', parent=None):
+        parent = self.world if parent is None else self.get(parent)
+        node = Node(name, node_type, parent)
+        parent.children.append(node)
+        self.paths[node.path] = node
+        self.uuids[node.uuid] = node
+        return node
+
+    def add_mesh(self, name, points, counts, connects, parent=None):
+        """
+        Create transform with mesh shape, returns the transform.
+        """
+        transform = self.create(name, 'transform', parent)
+        shape = self.create(name + 'Shape', 'mesh', transform)
+        shape.mesh = Mesh(points, counts, connects)
+        return transform
+
+    def get(self, name):
+        if isinstance(name, Node):
+            return name
+        name = str(name)
+        if name in self.paths:
+            return self.paths[name]
+        if name in self.uuids:
+            return self.uuids[name]
+        matches = [n for p, n in self.paths.items() if p.rsplit('|', 1)[-1] == name]
+        if len(matches) == 1:
+            return matches[0]
+        raise ValueError('No object matches name: {}'.format(name))
+
+    def nodes(self):
+        for child in self.world.children:
+            for node in child.walk():
+                yield node
+
+
+def _as_list(args):
+    result = []
+    for arg in args:
+        if isinstance(arg, (list, tuple)):
+            result.extend(arg)
+        else:
+            result.append(arg)
+    return result
+
+
+def _split_plug(plug):
+    node, attr = plug.split('.', 1)
+    return node, attr
+
+
+def _ranges(path, kind, indices):
+    indices = np.unique(np.asarray(indices, dtype=int))
+    if not len(indices):
+        return []
+    breaks = np.flatnonzero(np.diff(indices) != 1) + 1
+    return ['{}.{}[{}:{}]'.format(path, kind, r[0], r[-1]) for r in np.split(indices, breaks)]
+
+
+COMPONENT = re.compile(r'(.+)\.(\w+)\[(\d+|\*)(?::(\d+))?\]$')
+
+
+class FakeCmds(object):
+    """
+    Subset of ``maya.cmds`` working on a :class:`FakeScene`.
+    """
+
+    def __init__(self, scene=None):
+        self.scene = scene or FakeScene()
+        self.calls = collections.Counter()
+        self.created = []
+
+    def module(self, name='maya.cmds'):
+        """
+        Return module exposing commands, each call is counted.
+        """
+        module = types.ModuleType(name)
+        for attr in dir(self):
+            if attr.startswith('_') or attr in ('module', 'scene', 'calls', 'created'):
+                continue
+            setattr(module, attr, self._counted(attr, getattr(self, attr)))
+        return module
+
+    def _counted(self, name, func):
+        def wrapper(*args, **kwargs):
+            self.calls[name] += 1
+            return func(*args, **kwargs)
+        wrapper.__name__ = name
+        return wrapper
+
+    def _components(self, names):
+        """
+        Yield shape node, component kind and indices of component names.
+        """
+        for name in _as_list(names):
+            path, kind, lo, hi = COMPONENT.match(name).groups()
+            node = self.scene.get(path)
+            if node.mesh is None:
+                node = next(c for c in node.children if c.mesh is not None)
+            if lo == '*':
+                total = {'vtx': len(node.mesh.points), 'f': len(node.mesh.counts),
+                         'e': len(node.mesh.edges()[0])}[kind]
+                indices = np.arange(total)
+            else:
+                indices = np.arange(int(lo), int(hi or lo) + 1)
+            yield node, kind, indices
+
+    def _unique_name(self, name):
+        names = set(path.rsplit('|', 1)[-1] for path in self.scene.paths)
+        if name not in names:
+            return name
+        base, number = name.rstrip('0123456789'), 1
+        while '{}{}'.format(base, number) in names:
+            number += 1
+        return '{}{}'.format(base, number)
+
+    def _name(self, node, long=False, uuid=False):
+        if uuid:
+            return node.uuid
+        return node.path if long else node.name
+
+    # Queries
+
+    def ls(self, *args, **kwargs):
+        scene = self.scene
+        names = _as_list(args)
+        if kwargs.get('sl') or kwargs.get('selection'):
+            nodes = [scene.get(n.split('.')[0]) for n in scene.selection]
+        elif names:
+            nodes = [scene.get(n) for n in names]
+        elif kwargs.get('assemblies'):
+            nodes = list(scene.world.children)
+        else:
+            nodes = list(scene.nodes())
+
+        if kwargs.get('dag') and (names or kwargs.get('sl')):
+            seen, walked = set(), []
+            for node in nodes:
+                for each in node.walk():
+                    if id(each) not in seen:
+                        seen.add(id(each))
+                        walked.append(each)
+            nodes = walked
+
+        if kwargs.get('shapes'):
+            nodes = [n for n in nodes if n.is_shape]
+        if kwargs.get('transforms'):
+            nodes = [n for n in nodes if n.type == 'transform']
+        if kwargs.get('noIntermediate'):
+            nodes = [n for n in nodes if not n.intermediate]
+        if kwargs.get('intermediateObjects'):
+            nodes = [n for n in nodes if n.intermediate]
+        if kwargs.get('type'):
+            nodes = [n for n in nodes if n.type == kwargs['type']]
+        if kwargs.get('invisible'):
+            nodes = [n for n in nodes if not n.attrs.get('visibility', True)]
+
+        long, uuid = kwargs.get('long', False), kwargs.get('uuid', False)
+        if kwargs.get('showType'):
+            result = []
+            for node in nodes:
+                result.extend([self._name(node, long, uuid), node.type])
+            return result
+        return [self._name(node, long, uuid) for node in nodes]
+
+    def listRelatives(self, *args, **kwargs):
+        result = []
+        full = kwargs.get('fullPath', False)
+        for node in (self.scene.get(n) for n in _as_list(args)):
+            if kwargs.get('parent'):
+                if node.parent is not self.scene.world:
+                    result.append(self._name(node.parent, full))
+                continue
+            children = node.children
+            if kwargs.get('shapes'):
+                children = [c for c in children if c.is_shape]
+            if kwargs.get('noIntermediate'):
+                children = [c for c in children if not c.intermediate]
+            if kwargs.get('type'):
+                children = [c for c in children if c.type == kwargs['type']]
+            result.extend(self._name(c, full) for c in children)
+        return result or None
+
+    def xform(self, *args, **kwargs):
+        """
+        Vertex translations and transform matrix and pivots, transforms are
+        identity for vertex queries.
+        """
+        query = kwargs.get('q') or kwargs.get('query')
+        if query and kwargs.get('t'):
+            result, points = [], {}
+            for node, _, indices in self._components(args):
+                if node not in points:
+                    points[node] = node.mesh.final_points()
+                result.extend(points[node][indices].ravel().tolist())
+            return result
+
+        defaults = {'matrix': [1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0,
+                               0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0],
+                    'rotatePivot': [0.0, 0.0, 0.0], 'scalePivot': [0.0, 0.0, 0.0]}
+        for flag, default in defaults.items():
+            if flag not in kwargs:
+                continue
+            nodes = [self.scene.get(n) for n in _as_list(args)]
+            if query:
+                return list(nodes[0].attrs.get(flag, default))
+            for node in nodes:
+                node.attrs[flag] = list(kwargs[flag])
+
+    def polyListComponentConversion(self, *args, **kwargs):
+        assert kwargs.get('fromFace') and kwargs.get('toEdge')
+        result = []
+        for node, _, faces in self._components(args):
+            offsets = node.mesh.face_offsets()
+            face_vertices = np.concatenate([np.arange(offsets[f], offsets[f + 1]) for f in faces])
+            result.extend(_ranges(node.path, 'e', node.mesh.edges()[1][face_vertices]))
+        return result
+
+    def polyInfo(self, *args, **kwargs):
+        assert kwargs.get('edgeToVertex')
+        result = []
+        for node, _, edges in self._components(args):
+            pairs = node.mesh.edges()[0]
+            result.extend('EDGE {}: {} {} Hard\n'.format(e, *pairs[e]) for e in edges)
+        return result
+
+    def polyNormalPerVertex(self, *args, **kwargs):
+        return [False for _, _, indices in self._components(args) for _ in indices]
+
+    def objExists(self, name):
+        try:
+            self.scene.get(name)
+        except ValueError:
+            return False
+        return True
+
+    def about(self, **kwargs):
+        return bool(kwargs.get('batch'))
+
+    # Edits
+
+    def reorder(self, name, front=False, back=False, relative=0, r=None):
+        node = self.scene.get(name)
+        siblings = node.parent.children
+        index = siblings.index(node)
+        siblings.pop(index)
+        if front:
+            index = 0
+        elif back:
+            index = len(siblings)
+        else:
+            index += relative if r is None else r
+        siblings.insert(max(0, min(index, len(siblings))), node)
+
+    def select(self, *args, **kwargs):
+        if kwargs.get('cl') or kwargs.get('clear'):
+            self.scene.selection = []
+            return
+        names = [n if COMPONENT.match(n) else self.scene.get(n).path for n in _as_list(args)]
+        if kwargs.get('add'):
+            self.scene.selection.extend(names)
+        else:
+            self.scene.selection = names
+
+    def showHidden(self, *args, **kwargs):
+        for name in _as_list(args):
+            self.scene.get(name).attrs['visibility'] = True
+
+    def hide(self, *args, **kwargs):
+        for name in _as_list(args):
+            self.scene.get(name).attrs['visibility'] = False
+
+    def displaySurface(self, *args, **kwargs):
+        nodes = [self.scene.get(n) for n in _as_list(args)]
+        if kwargs.get('q') or kwargs.get('query'):
+            return [n.attrs.get('xRay', False) for n in nodes]
+        for node in nodes:
+            node.attrs['xRay'] = kwargs['xRay']
+
+    def polyOptions(self, *args, **kwargs):
+        query = kwargs.pop('q', kwargs.pop('query', False))
+        kwargs.pop('gl', None)
+        meshes = [n for n in (self.scene.get(s) for s in self.scene.selection)
+                  for n in [n] + n.children if n.type == 'mesh']
+        if query:
+            flag = next(iter(kwargs))
+            return [self.scene.poly_options[flag]] * len(meshes)
+        for flag, value in kwargs.items():
+            self.scene.poly_options[flag] = bool(value)
+
+    def getAttr(self, plug, multiIndices=False, **kwargs):
+        name, attr = _split_plug(plug)
+        node = self.scene.get(name)
+        match = re.match(r'pnts\[(\d+):(\d+)\]$', attr)
+        if match:
+            tweaks = node.mesh.tweaks
+            lo, hi = int(match.group(1)), int(match.group(2))
+            return [tuple(tweaks.get(i, (0.0, 0.0, 0.0))) for i in range(lo, hi + 1)]
+        if attr == 'pnts':
+            tweaks = node.mesh.tweaks
+            if multiIndices:
+                return sorted(tweaks) or None
+            return [tuple(tweaks[i]) for i in sorted(tweaks)]
+        return node.attrs.get(attr)
+
+    def setAttr(self, plug, *values, **kwargs):
+        name, attr = _split_plug(plug)
+        node = self.scene.get(name)
+        match = re.match(r'pnts\[(\d+):(\d+)\]$', attr)
+        if match:
+            lo, hi = int(match.group(1)), int(match.group(2))
+            values = np.array(values, dtype=float).reshape(-1, 3)
+            for index, value in zip(range(lo, hi + 1), values):
+                node.mesh.tweaks[index] = value
+            return
+        node.attrs[attr] = values[0] if len(values) == 1 else values
+
+    def createNode(self, node_type, name=None, parent=None, **kwargs):
+        node = self.scene.create(self._unique_name(name or node_type + '1'), node_type, parent)
+        if node_type == 'mesh':
+            node.mesh = Mesh([], [], [])
+        self.created.append(node)
+        return node.name
+
+    def _edit_mesh(self, args, edit):
+        # Indices refer to the mesh before the edit, apply once per mesh.
+        grouped = collections.OrderedDict()
+        for node, _, indices in self._components(args):
+            grouped.setdefault(node, []).append(indices)
+        for node, indices in grouped.items():
+            edit(node.mesh, np.unique(np.concatenate(indices)))
+            _Callbacks.topology_changed(node)
+
+    def polyDelFacet(self, *args, **kwargs):
+        self._edit_mesh(args, lambda mesh, faces: mesh.delete_faces(faces))
+
+    def polyDelEdge(self, *args, **kwargs):
+        self._edit_mesh(args, lambda mesh, edges: mesh.delete_edges(edges))
+
+    def polyMergeVertex(self, *args, **kwargs):
+        distance = kwargs.get('distance', 0.0)
+        self._edit_mesh(args, lambda mesh, vertices: mesh.merge_vertices(vertices, distance))
+
+    def delete(self, *args, **kwargs):
+        if kwargs.get('ch') or kwargs.get('constructionHistory'):
+            return
+        for name in _as_list(args):
+            node = self.scene.get(name)
+            node.parent.children.remove(node)
+            for each in node.walk():
+                self.scene.paths.pop(each.path, None)
+                self.scene.uuids.pop(each.uuid, None)
+
+    # Commands only needing to exist.
+
+    def undoInfo(self, *args, **kwargs):
+        pass
+
+    def progressBar(self, *args, **kwargs):
+        return False
+
+    def makeIdentity(self, *args, **kwargs):
+        pass
+
+    def sets(self, *args, **kwargs):
+        pass
+
+    def polyDelVertex(self, *args, **kwargs):
+        pass
+
+    def hilite(self, *args, **kwargs):
+        pass
+
+
+class FakeMel(object):
+    """
+    ``maya.mel`` stand-in, every proc exists and eval is counted.
+    """
+
+    def __init__(self, calls):
+        self.calls = calls
+
+    def module(self, name='maya.mel'):
+        module = types.ModuleType(name)
+        module.eval = self.eval
+        return module
+
+    def eval(self, command):
+        self.calls['mel.eval'] += 1
+        if command.startswith('exists '):
+            return 1
+        return ''
+
+
+class _Callbacks(object):
+    """
+    Hands out callback ids. Only poly topology callbacks are fired, by
+    commands changing a mesh.
+    """
+
+    ids = itertools.count(1)
+    registered = {}
+
+    @classmethod
+    def add(cls, method, *args):
+        callback_id = next(cls.ids)
+        cls.registered[callback_id] = (method,) + args
+        return callback_id
+
+    @classmethod
+    def topology_changed(cls, node):
+        for args in list(cls.registered.values()):
+            if args[0] == 'addPolyTopologyChangedCallback' and args[1].fake_node is node:
+                args[2]()
+
+
+def _message_class(name, constants=()):
+    attrs = dict((c, c) for c in constants)
+
+    def adder(method):
+        def add(*args):
+            return _Callbacks.add(method, *args)
+        return staticmethod(add)
+
+    for method in ['addCallback', 'addStringArrayCallback', 'addEventCallback',
+                   'addNodeAddedCallback', 'addNodeRemovedCallback',
+                   'addAllDagChangesCallback', 'addPolyTopologyChangedCallback',
+                   'addNodeDirtyCallback', 'addNodePreRemovalCallback',
+                   'addNameChangedCallback']:
+        attrs[method] = adder(method)
+    return type(name, (object,), attrs)
+
+
+def make_openmaya(cmds, name='maya.api.OpenMaya'):
+    """
+    Return module with the OpenMaya subset mamtools uses.
+    """
+    scene = lambda: cmds.scene
+    module = types.ModuleType(name)
+
+    class MSpace(object):
+        kObject, kWorld = 'object', 'world'
+
+    class MFn(object):
+        kMesh, kShape, kTransform, kDagNode = 'mesh', 'shape', 'transform', 'dagNode'
+        kMeshVertComponent, kMeshEdgeComponent, kMeshPolygonComponent = 31, 32, 34
+
+    class MObject(object):
+
+        def __init__(self, node):
+            self.fake_node = node
+
+        def hasFn(self, fn):
+            if fn == MFn.kShape:
+                return self.fake_node.is_shape
+            if fn == MFn.kDagNode:
+                # Nodes outside the dag have no parent, not even the world.
+                return self.fake_node is not None and self.fake_node.parent is not None
+            return self.fake_node.type == fn
+
+    MObject.kNullObj = MObject(None)
+
+    class MDagPath(object):
+
+        def __init__(self, node=None):
+            self.fake_node = node.fake_node if isinstance(node, MDagPath) else node
+
+        def fullPathName(self):
+            return self.fake_node.path
+
+        def extendToShape(self):
+            if not self.fake_node.is_shape:
+                shapes = [c for c in self.fake_node.children
+                          if c.is_shape and not c.intermediate]
+                if shapes:
+                    return MDagPath(shapes[0])
+            return MDagPath(self.fake_node)
+
+        def node(self):
+            return MObject(self.fake_node)
+
+        def pop(self):
+            self.fake_node = self.fake_node.parent
+
+        def length(self):
+            return self.fake_node.path.count('|')
+
+        def instanceNumber(self):
+            return 0
+
+        def inclusiveMatrixInverse(self):
+            return [1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0,
+                    0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0]
+
+    class MSelectionList(object):
+
+        def __init__(self):
+            self.items = []
+
+        def add(self, name):
+            self.items.append(scene().get(name))
+            return self
+
+        def getDagPath(self, index):
+            return MDagPath(self.items[index])
+
+        def getDependNode(self, index):
+            return MObject(self.items[index])
+
+    class MUuid(object):
+
+        def __init__(self, value):
+            self.value = value
+
+        def asString(self):
+            return self.value
+
+    class MFnDependencyNode(object):
+
+        def __init__(self, mobject):
+            self.fake_node = mobject.fake_node
+
+        @property
+        def typeName(self):
+            return self.fake_node.type
+
+        def name(self):
+            return self.fake_node.name
+
+        def uuid(self):
+            return MUuid(self.fake_node.uuid)
+
+    class MFnMesh(object):
+        """
+        Mesh function set on a shape, or on data from :class:`MFnMeshData`.
+        """
+
+        def __init__(self, obj=None):
+            cmds.calls['MFnMesh'] += 1
+            self.fake_node = self.fake_mesh = None
+            if isinstance(obj, MDagPath):
+                self.fake_node = obj.extendToShape().fake_node
+                self.fake_mesh = self.fake_node.mesh
+            elif obj is not None:
+                self.fake_mesh = obj.fake_mesh
+
+        def create(self, points, counts, connects, parent=MObject.kNullObj):
+            # Shapes made here would skip the undo queue, only data is built.
+            if not hasattr(parent, 'fake_mesh'):
+                raise RuntimeError('Create meshes in MFnMeshData, shapes come from createNode.')
+            parent.fake_mesh = self.fake_mesh = Mesh([tuple(p)[:3] for p in points], counts, connects)
+            self.fake_mesh.uvs = {'map1': None}
+            return parent
+
+        def copyInPlace(self, source):
+            self.fake_node.mesh = self.fake_mesh = source.fake_mesh.copy()
+
+        def fullPathName(self):
+            return self.fake_node.path
+
+        @property
+        def numVertices(self):
+            return len(self.fake_mesh.points)
+
+        @property
+        def numEdges(self):
+            return len(self.fake_mesh.edges()[0])
+
+        def getPoints(self, space=None):
+            # An MPointArray is converted point by point like in maya.
+            return [MPoint(p) for p in self.fake_mesh.final_points().tolist()]
+
+        def getVertices(self):
+            return self.fake_mesh.counts.tolist(), self.fake_mesh.connects.tolist()
+
+        def getConnectedShaders(self, instance):
+            return [], [-1] * len(self.fake_mesh.counts)
+
+        def getCreaseVertices(self):
+            return [], []
+
+        def getCreaseEdges(self):
+            return [], []
+
+        def currentUVSetName(self):
+            return next(iter(self.fake_mesh.uvs), '')
+
+        def getUVSetNames(self):
+            return list(self.fake_mesh.uvs)
+
+        def getUVs(self, name):
+            u, v, _ = self.fake_mesh.uvs[name]
+            return u.tolist(), v.tolist()
+
+        def getAssignedUVs(self, name):
+            return self.fake_mesh.counts.tolist(), self.fake_mesh.uvs[name][2].tolist()
+
+        def currentColorSetName(self):
+            return ''
+
+        def getColorSetNames(self):
+            return []
+
+        def createUVSet(self, name):
+            self.fake_mesh.uvs[name] = None
+
+        def renameUVSet(self, name, new_name):
+            self.fake_mesh.uvs[new_name] = self.fake_mesh.uvs.pop(name)
+
+        def setUVs(self, u, v, name):
+            self.fake_mesh.uvs[name] = (np.array(u), np.array(v), None)
+
+        def assignUVs(self, counts, ids, name):
+            u, v, _ = self.fake_mesh.uvs[name]
+            self.fake_mesh.uvs[name] = (u, v, np.array(ids, dtype=int))
+
+        def _noop(self, *args, **kwargs):
+            pass
+
+        setCurrentUVSetName = setEdgeSmoothings = cleanupEdgeSmoothing = _noop
+        setCreaseEdges = updateSurface = _noop
+
+    class MPoint(tuple):
+        """
+        Point with x, y, z and w.
+        """
+
+        def __new__(cls, *args):
+            values = list(args[0] if len(args) == 1 else args)
+            return tuple.__new__(cls, (values + [0.0, 0.0, 0.0, 1.0][len(values):])[:4])
+
+    class MFloatVector(object):
+
+        def __init__(self, x=0.0, y=0.0, z=0.0):
+            self.fake_vector = np.array([x, y, z], dtype=float)
+
+        def __xor__(self, other):
+            return MFloatVector(*np.cross(self.fake_vector, other.fake_vector))
+
+        def __iter__(self):
+            return iter(self.fake_vector.tolist())
+
+        def normalize(self):
+            self.fake_vector /= np.linalg.norm(self.fake_vector) or 1.0
+            return self
+
+    class MFnMeshData(object):
+
+        def create(self):
+            data = MObject(None)
+            data.fake_mesh = None
+            return data
+
+    class MFnSingleIndexedComponent(object):
+
+        def create(self, kind):
+            self.mobject = MObject(None)
+            self.mobject.fake_elements = []
+            return self.mobject
+
+        def addElements(self, elements):
+            self.mobject.fake_elements.extend(elements)
+
+    class MItMeshPolygon(object):
+
+        def __init__(self, dagpath, component):
+            self.fake_mesh = dagpath.extendToShape().fake_node.mesh
+            self.offsets = self.fake_mesh.face_offsets()
+            self.faces = component.fake_elements
+            self.reset()
+
+        def reset(self):
+            self.position = 0
+
+        def isDone(self):
+            return self.position >= len(self.faces)
+
+        def next(self):
+            self.position += 1
+
+        def index(self):
+            return self.faces[self.position]
+
+        def _face_vertices(self):
+            face = self.index()
+            return np.arange(self.offsets[face], self.offsets[face + 1])
+
+        def getVertices(self):
+            return self.fake_mesh.connects[self._face_vertices()].tolist()
+
+        def hasUVs(self, name):
+            return self.fake_mesh.uvs.get(name) is not None
+
+        def getUVIndexAndValue(self, vertex, name):
+            u, v, ids = self.fake_mesh.uvs[name]
+            uv_id = int(ids[self._face_vertices()[vertex]])
+            return uv_id, float(u[uv_id]), float(v[uv_id])
+
+        def getColors(self, name):
+            return []
+
+        def getNormals(self, space=None):
+            return [(0.0, 1.0, 0.0)] * len(self._face_vertices())
+
+    class MMessage(object):
+
+        @staticmethod
+        def removeCallbacks(ids):
+            for callback_id in ids:
+                _Callbacks.registered.pop(callback_id, None)
+
+    classes = [MSpace, MFn, MObject, MDagPath, MSelectionList, MUuid,
+               MFnDependencyNode, MFnMesh, MFnMeshData, MFnSingleIndexedComponent,
+               MItMeshPolygon, MMessage, MPoint, MFloatVector]
+    for cls in classes:
+        setattr(module, cls.__name__, cls)
+
+    # Other value and array types are plain tuples and lists.
+    for name in ['MColor', 'MVector']:
+        setattr(module, name, tuple)
+    for name in ['MPointArray', 'MIntArray', 'MUintArray', 'MFloatArray',
+                 'MDoubleArray', 'MColorArray', 'MVectorArray']:
+        setattr(module, name, list)
+
+    module.MDGMessage = _message_class('MDGMessage')
+    module.MDagMessage = _message_class('MDagMessage', ['kChildAdded', 'kChildRemoved'])
+    module.MEventMessage = _message_class('MEventMessage')
+    module.MPolyMessage = _message_class('MPolyMessage')
+    module.MNodeMessage = _message_class('MNodeMessage')
+    module.MSceneMessage = _message_class('MSceneMessage', [
+        'kAfterNew', 'kAfterOpen', 'kBeforeNew', 'kBeforeOpen',
+        'kAfterPluginLoad', 'kAfterPluginUnload',
+    ])
+    return module
+
+
+COMPONENT_KINDS = {'vtx': 31, 'e': 32, 'f': 34}
+
+
+class FakeComponent(object):
+    """
+    Mesh component standing in for the mampy components tools use.
+    """
+
+    def __init__(self, dagpath, kind, indices=()):
+        self.dagpath = dagpath
+        self.type = kind
+        self.indices = list(indices)
+
+    @classmethod
+    def create(cls, dagpath):
+        # MeshVert.create
+        return cls(dagpath, COMPONENT_KINDS['vtx'])
+
+    def __len__(self):
+        return len(self.indices)
+
+    @property
+    def _mesh(self):
+        return self.dagpath.extendToShape().fake_node.mesh
+
+    @property
+    def normals(self):
+        return [(0.0, 1.0, 0.0)] * len(self.indices)
+
+    def is_vert(self):
+        return self.type == COMPONENT_KINDS['vtx']
+
+    def new(self):
+        return FakeComponent(self.dagpath, self.type)
+
+    def add(self, indices):
+        self.indices.extend(indices)
+        return self
+
+    def cmdslist(self):
+        kind = dict((v, k) for k, v in COMPONENT_KINDS.items())[self.type]
+        return _ranges(self.dagpath.extendToShape().fullPathName(), kind, self.indices)
+
+    def to_vert(self):
+        if self.is_vert():
+            return self
+        mesh = self._mesh
+        if self.type == COMPONENT_KINDS['f']:
+            face_of = np.repeat(np.arange(len(mesh.counts)), mesh.counts)
+            indices = mesh.connects[np.isin(face_of, self.indices)]
+        else:
+            indices = mesh.edges()[0][self.indices].ravel()
+        return FakeComponent(self.dagpath, COMPONENT_KINDS['vtx'], np.unique(indices).tolist())
+
+    def to_face(self):
+        if self.type == COMPONENT_KINDS['f']:
+            return self
+        mesh = self._mesh
+        face_of = np.repeat(np.arange(len(mesh.counts)), mesh.counts)
+        per_face_vertex = mesh.connects if self.is_vert() else mesh.edges()[1]
+        faces = np.unique(face_of[np.isin(per_face_vertex, self.indices)])
+        return FakeComponent(self.dagpath, COMPONENT_KINDS['f'], faces.tolist())
+
+
+class FakeComponentList(list):
+
+    def cmdslist(self):
+        return [name for comp in self for name in comp.cmdslist()]
+
+
+class FakeNode(object):
+    """
+    Enough of mampy ``Node`` for transform names.
+    """
+
+    def __init__(self, dagpath):
+        node = dagpath.fake_node
+        self.transform = self if node.type == 'transform' else FakeNode(type(dagpath)(node.parent))
+        self.short_name = node.name
+
+
+def make_mampy(cmds, api):
+    """
+    Return module with the mampy calls tools make, selection comes from
+    the fake scene.
+    """
+    module = types.ModuleType('mampy')
+
+    def complist(*args, **kwargs):
+        grouped = collections.OrderedDict()
+        for node, kind, indices in cmds._components(
+                [n for n in cmds.scene.selection if COMPONENT.match(n)]):
+            key = (node.path, kind)
+            if key not in grouped:
+                grouped[key] = FakeComponent(api.MDagPath(node), COMPONENT_KINDS[kind])
+            grouped[key].add(indices.tolist())
+        return FakeComponentList(grouped.values())
+
+    module.complist = module.multicomplist = complist
+    module.daglist = lambda *args, **kwargs: FakeComponentList()
+    module.get_average_vert_normal = lambda normals, indices: api.MFloatVector(0.0, 1.0, 0.0)
+    return module
+
+
+def install_mampy(cmds, api, modules):
+    """
+    Point mampy names in mamtools `modules` at the fakes.
+    """
+    mampy = make_mampy(cmds, api)
+    fakes = {
+        'mampy': mampy,
+        'get_average_vert_normal': mampy.get_average_vert_normal,
+        'Node': FakeNode,
+        'MeshVert': FakeComponent,
+        'SingleIndexComponent': FakeComponent,
+        'ComponentList': FakeComponentList,
+    }
+    for module in modules:
+        for name, fake in fakes.items():
+            if hasattr(module, name):
+                setattr(module, name, fake)
+    return mampy
+
+
+def install(scene=None):
+    """
+    Install fake maya modules and stubs, returns the :class:`FakeCmds`.
+
+    Swap scenes later by setting ``cmds.scene``.
+    """
+    cmds = FakeCmds(scene)
+    openmaya = make_openmaya(cmds)
+
+    maya = types.ModuleType('maya')
+    maya.__path__ = []
+    maya.cmds = cmds.module()
+    maya.mel = FakeMel(cmds.calls).module()
+    maya.api = types.ModuleType('maya.api')
+    maya.api.__path__ = []
+    maya.api.OpenMaya = openmaya
+    maya.OpenMaya = openmaya
+
+    sys.modules.update({
+        'maya': maya,
+        'maya.cmds': maya.cmds,
+        'maya.mel': maya.mel,
+        'maya.api': maya.api,
+        'maya.api.OpenMaya': openmaya,
+        'maya.OpenMaya': openmaya,
+    })
+    stubs.install(('mampy', 'PySide', 'shiboken'))
+    return cmds
@@ -0,0 +1,82 @@
+"""
+Import Time Benchmark
+
+Time ``import mamtools`` in fresh interpreters with maya, mampy and PySide
+stubbed out. Fails if importing the package pulls in submodules or heavy
+dependencies, or if the median time is above ``--max-ms``.
+
+    python benchmarks/import_time.py --runs 20 --max-ms 50
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must not be imported by ``import mamtools`` alone.
+HEAVY = [
+    'mampy', 'numpy', 'PySide', 'maya.OpenMaya', 'maya.api.OpenMaya',
+    'mamtools.camera', 'mamtools.delete', 'mamtools.display', 'mamtools.mesh',
+    'mamtools.sort_outliner', 'mamtools.pivots',
+]
+
+CHILD = '''
+import sys, time, json
+sys.path[:0] = [{root!r}, {benchmarks!r}]
+import stubs
+stubs.install()
+start = time.time()
+import mamtools
+{touch}
+elapsed = time.time() - start
+print(json.dumps({{'elapsed': elapsed, 'modules': sorted(sys.modules)}}))
+'''
+
+
+def run_once(touch=False):
+    code = CHILD.format(
+        root=ROOT,
+        benchmarks=os.path.join(ROOT, 'benchmarks'),
+        touch='mamtools.display.DisplayState' if touch else '',
+    )
+    output = subprocess.check_output([sys.executable, '-c', code])
+    return json.loads(output.decode('utf-8').strip().splitlines()[-1])
+
+
+def median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) * 0.5
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--max-ms', type=float, default=None)
+    parser.add_argument('--touch', action='store_true',
+                        help='also access a submodule to time a lazy load')
+    args = parser.parse_args(argv)
+
+    results = [run_once(args.touch) for _ in range(args.runs)]
+    elapsed = median([r['elapsed'] for r in results]) * 1000.0
+    print('import mamtools: {:.2f} ms median of {} runs'.format(elapsed, args.runs))
+
+    failed = False
+    if not args.touch:
+        loaded = [name for name in HEAVY if name in results[0]['modules']]
+        if loaded:
+            print('eagerly imported: {}'.format(', '.join(loaded)))
+            failed = True
+    if args.max_ms is not None and elapsed > args.max_ms:
+        print('slower than {:.2f} ms'.format(args.max_ms))
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
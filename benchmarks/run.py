@@ -0,0 +1,384 @@
+"""
+Benchmark Suite
+
+Run mamtools solvers and tools on generated scenes of growing size and
+save wall time and maya command counts as JSON. Tools run against
+:mod:`fakemaya`, mesh tools read their selection through the fake mampy
+components so their command counts show how they scale. Each benchmark
+names the tool it stands for.
+
+Tools in pivots and camera work on the active manipulator or camera and
+do the same amount of work whatever the scene size, so they have no
+benchmark here.
+
+    python benchmarks/run.py --sizes 1000 10000 100000 --output results.json
+    python benchmarks/run.py --only weld_clusters outliner_sort
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import collections
+
+import numpy as np
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.dirname(BENCHMARKS), BENCHMARKS]
+
+import fakemaya  # noqa: E402
+
+cmds = fakemaya.install()
+
+from mamtools import geometry, meshdata, topology, scene  # noqa: E402
+from mamtools import delete, display, mesh, sort_outliner  # noqa: E402
+
+mampy = fakemaya.install_mampy(cmds, sys.modules['maya.api.OpenMaya'], [delete, mesh])
+
+
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+SHAPE_TYPES = ['mesh', 'nurbsCurve', 'camera', 'pointLight', 'locator', None]
+
+benchmarks = collections.OrderedDict()
+
+
+def benchmark(tool):
+    """
+    Register setup function, it gets a size and returns the callable to
+    time. `tool` names the mamtools function the benchmark stands for.
+    """
+    def register(func):
+        benchmarks[func.__name__] = (tool, func)
+        return func
+    return register
+
+
+# Generators
+
+def grid(size):
+    """
+    Return points, counts and connects for a quad grid with about `size`
+    vertices.
+    """
+    side = max(2, int(size ** 0.5))
+    x, z = np.meshgrid(np.arange(side, dtype=float), np.arange(side, dtype=float))
+    points = np.c_[x.ravel(), np.random.rand(side * side) * 0.1, z.ravel()]
+    corner = (np.arange(side - 1)[:, None] * side + np.arange(side - 1)).ravel()
+    connects = np.c_[corner, corner + 1, corner + side + 1, corner + side].ravel()
+    counts = np.full(len(corner), 4, dtype=int)
+    return points, counts, connects
+
+
+def split_grid(size):
+    """
+    Return quad grid where every face has its own vertices.
+    """
+    points, counts, connects = grid(size)
+    return points[connects], counts, np.arange(len(connects))
+
+
+def circle(size, noise=0.05):
+    angles = np.sort(np.random.rand(size)) * np.pi * 2
+    points = np.c_[np.cos(angles), np.zeros(size), np.sin(angles)]
+    return points + np.random.rand(size, 3) * noise
+
+
+def new_scene():
+    """
+    Swap in an empty fake scene and reset mamtools scene caches.
+    """
+    cmds.scene = fakemaya.FakeScene()
+    scene._index.uninstall()
+    scene._index.built = False
+    display.display_state.invalidate()
+    meshdata.topology_cache.clear()
+    return cmds.scene
+
+
+def mesh_tool(size, tool, select, generator=grid):
+    """
+    Return callable running `tool` on a fresh mesh scene.
+
+    Mesh tools change the mesh, the scene is rebuilt on every run.
+    `select` gets the shape and the grid side and returns the selected
+    component names.
+    """
+    points, counts, connects = generator(size)
+    side = max(2, int(size ** 0.5))
+
+    def run():
+        shape = new_scene().add_mesh('grid', points, counts, connects).children[0].path
+        cmds.scene.selection = select(shape, side)
+        tool()
+    return run
+
+
+def face_block(shape, side, rows, columns=None):
+    """
+    Return names of a block of faces centered on a grid.
+    """
+    columns = rows if columns is None else columns
+    row = np.arange(rows) + (side - 1 - rows) // 2
+    column = np.arange(columns) + (side - 1 - columns) // 2
+    return meshdata.component_ranges(shape, 'f', (row[:, None] * (side - 1) + column).ravel())
+
+
+def row_edges(shape, side, step, length):
+    """
+    Return names of horizontal edge chains of `length` edges every `step`
+    rows and columns, clear of the grid border.
+    """
+    pairs = fakemaya.Mesh(*grid(side * side)).edges()[0]
+    row, column = pairs[:, 0] // side, pairs[:, 0] % side
+    chosen = ((pairs[:, 1] - pairs[:, 0] == 1) & (row % step == 1) & (row < side - 1) &
+              (column % step >= 1) & (column % step <= length) & (column < side - step))
+    return meshdata.component_ranges(shape, 'e', np.flatnonzero(chosen))
+
+
+def populate(fake_scene, size, depth=1, children=10):
+    """
+    Add about `size` nodes, assemblies when depth is 1 otherwise a
+    hierarchy `depth` levels deep with `children` per group.
+    """
+    names = ['node{}'.format(i) for i in range(size)]
+    random.shuffle(names)
+    parents, created = [None], 0
+    for level in range(depth):
+        last = level == depth - 1
+        next_parents = []
+        for parent in parents:
+            count = size if depth == 1 else children
+            for _ in range(count):
+                if created >= size:
+                    break
+                shape_type = None if not last else random.choice(SHAPE_TYPES)
+                node = fake_scene.create(names[created], 'transform', parent)
+                if shape_type is not None:
+                    fake_scene.create(names[created] + 'Shape', shape_type, node)
+                next_parents.append(node)
+                created += 1
+        parents = next_parents
+
+
+# Solvers
+
+@benchmark('mesh.draw_circle')
+def find_start_vertex(size):
+    points = circle(size)
+    return lambda: geometry.find_start_vertex(points, np.array([1.0, 0.0, 0.0]))
+
+
+@benchmark('mesh.draw_circle')
+def assign_to_circle(size):
+    points = circle(size)
+    targets = geometry.circle_points(np.zeros(3), 1.0, np.array([1.0, 0, 0]),
+                                     np.array([0, 0, 1.0]), size)
+    return lambda: geometry.assign_to_circle(points, targets, np.zeros(3), np.array([0, 1.0, 0]))
+
+
+@benchmark('mesh.draw_circle')
+def border_loops(size):
+    points, counts, connects = grid(size)
+    mesh_topology = topology.Topology(counts, connects, vertex_count=len(points))
+    faces = np.arange(len(counts))
+
+    def run():
+        found, groups = mesh_topology.face_groups(faces)
+        edge_groups, edges, shared = mesh_topology.group_edges(found, groups)
+        return topology.order_loops(mesh_topology.edge_vertices[edges[shared == 1]])
+    return run
+
+
+@benchmark('mesh.set_face_weighted_normals')
+def vertex_normals(size):
+    points, counts, connects = grid(size)
+    return lambda: geometry.vertex_normals(points, counts, connects)
+
+
+@benchmark('mesh.flatten')
+def fit_plane(size):
+    points = np.random.rand(size, 3) * [1, 0.01, 1]
+    return lambda: geometry.project_to_plane(points, *geometry.fit_plane(points))
+
+
+@benchmark('mesh.combine_separate')
+def label_shells(size):
+    points, counts, connects = grid(size)
+    return lambda: topology.label_shells(counts, connects, len(points))
+
+
+@benchmark('delete.weld')
+def weld_clusters(size):
+    points = np.random.rand(size, 3) * size ** (1.0 / 3)
+    points = np.r_[points, points[:size // 10] + 1e-5]
+    return lambda: geometry.cluster_counts(geometry.weld_clusters(points, 0.001))
+
+
+@benchmark('delete.merge_faces')
+def most_shared_faces(size):
+    points, counts, connects = grid(size)
+    groups = connects.reshape(-1, 4)
+
+    def run():
+        mesh_topology = topology.Topology(counts, connects, vertex_count=len(points))
+        return topology.most_shared_faces(mesh_topology, groups)
+    return run
+
+
+@benchmark('delete.unbevel')
+def closest_line_midpoints(size):
+    lines = np.random.rand(4, size, 3)
+    return lambda: geometry.closest_line_midpoints(*lines)
+
+
+@benchmark('sort_outliner.plan_reorder')
+def plan_reorder(size):
+    current = ['node{}'.format(i) for i in range(size)]
+    target = list(current)
+    random.shuffle(target)
+    return lambda: sort_outliner.plan_reorder(current, target)
+
+
+# Tools on the fake scene
+
+@benchmark('sort_outliner.outliner_sort')
+def outliner_sort(size):
+    populate(new_scene(), size)
+    return sort_outliner.outliner_sort
+
+
+@benchmark('sort_outliner.outliner_sort')
+def outliner_sort_hierarchy(size):
+    populate(new_scene(), size, depth=4)
+    return lambda: sort_outliner.outliner_sort(hierarchy=True)
+
+
+@benchmark('scene.SceneIndex.build')
+def scene_index(size):
+    populate(new_scene(), size)
+    return scene.get_index
+
+
+@benchmark('display.unhide_all')
+def unhide_all(size):
+    fake_scene = new_scene()
+    points, counts, connects = grid(4)
+    for i in range(size):
+        node = fake_scene.add_mesh('mesh{}'.format(i), points, counts, connects)
+        node.attrs['visibility'] = bool(i % 2)
+    return display.unhide_all
+
+
+@benchmark('meshdata.PointWriter.commit')
+def point_writer(size):
+    fake_scene = new_scene()
+    points, counts, connects = grid(size)
+    mesh = fake_scene.add_mesh('grid', points, counts, connects).path
+    indices = np.random.choice(len(points), len(points) // 2, replace=False)
+
+    def run():
+        writer = meshdata.PointWriter()
+        writer.set(mesh, indices, points[indices] + 1.0)
+        writer.commit()
+    return run
+
+
+def measure(name, size, repeat=1):
+    tool, setup = benchmarks[name]
+    random.seed(size)
+    np.random.seed(size % (2 ** 32))
+    func = setup(size)
+
+    best, calls = None, None
+    for _ in range(repeat):
+        cmds.calls.clear()
+        start = time.time()
+        func()
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best, calls = elapsed, dict(cmds.calls)
+    return {'benchmark': name, 'tool': tool, 'size': size,
+            'seconds': best, 'calls': calls}
+
+
+@benchmark('mesh.draw_circle')
+def draw_circle_faces(size):
+    return mesh_tool(size, mesh.draw_circle, lambda shape, side: face_block(shape, side, side // 2))
+
+
+@benchmark('mesh.detach')
+def detach_faces(size):
+    # Same 200 faces at every size, the cost should not follow the mesh.
+    return mesh_tool(size, lambda: mesh.detach(extract=True),
+                     lambda shape, side: face_block(shape, side, min(10, side - 1), min(20, side - 1)))
+
+
+@benchmark('delete.collapse')
+def collapse_edges(size):
+    return mesh_tool(size, delete.collapse, lambda shape, side: row_edges(shape, side, 4, 1))
+
+
+@benchmark('delete.weld')
+def weld_split_grid(size):
+    def select(shape, side):
+        return ['{}.vtx[*]'.format(shape)]
+    return mesh_tool(size, lambda: delete.weld(mampy.complist(), 0.001), select, split_grid)
+
+
+@benchmark('delete.unbevel')
+def unbevel_edges(size):
+    return mesh_tool(size, delete.unbevel, lambda shape, side: row_edges(shape, side, 8, 3))
+
+
+@benchmark('delete.merge_faces')
+def merge_face_blocks(size):
+    def select(shape, side):
+        corner = np.arange(0, side - 2, 4)
+        corner = (corner[:, None] * (side - 1) + corner).ravel()
+        faces = np.c_[corner, corner + 1, corner + side - 1, corner + side].ravel()
+        return meshdata.component_ranges(shape, 'f', faces)
+    return mesh_tool(size, delete.merge_faces, select)
+
+
+@benchmark('delete.delete')
+def delete_faces(size):
+    def select(shape, side):
+        faces = np.random.choice((side - 1) ** 2, (side - 1) ** 2 // 10, replace=False)
+        return meshdata.component_ranges(shape, 'f', faces)
+    return mesh_tool(size, delete.delete, select)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--only', nargs='+', choices=list(benchmarks), default=None)
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--output', default=None, help='write results to json file')
+    args = parser.parse_args(argv)
+
+    results = []
+    for name in args.only or benchmarks:
+        for size in args.sizes:
+            result = measure(name, size, args.repeat)
+            results.append(result)
+            print('{:<26} {:>9} {:>10.4f}s  {}'.format(
+                name, size, result['seconds'],
+                ' '.join('{}={}'.format(k, v) for k, v in sorted(result['calls'].items()))
+            ))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'python': platform.python_version(),
+                'numpy': np.__version__,
+                'platform': platform.platform(),
+                'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'results': results,
+            }, f, indent=2, sort_keys=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""
+Stub Modules
+
+Import hook standing in for maya, mampy and PySide outside of maya. Any
+module or attribute under the stubbed packages resolves to a stub that
+can be called, subclassed and used as decorator, enough to import
+mamtools and time it.
+"""
+import sys
+import types
+
+
+STUBBED = ('maya', 'mampy', 'PySide', 'shiboken')
+
+
+class _StubMeta(type):
+
+    def __getattr__(cls, attr):
+        if attr.startswith('__'):
+            raise AttributeError(attr)
+        return stub_class(attr)
+
+    def __call__(cls, *args, **kwargs):
+        # Stubbed decorators used without arguments, like ``@repeatable``.
+        if cls.__dict__.get('_decorator') and len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return super(_StubMeta, cls).__call__(*args, **kwargs)
+
+
+def _stub_call(self, *args, **kwargs):
+    # Decorators get the decorated function back.
+    if len(args) == 1 and callable(args[0]) and not kwargs:
+        return args[0]
+    return self.__class__()
+
+
+def _stub_getattr(self, attr):
+    if attr.startswith('__'):
+        raise AttributeError(attr)
+    return stub_class(attr)()
+
+
+Stub = _StubMeta('Stub', (object,), {
+    '__init__': lambda self, *args, **kwargs: None,
+    '__call__': _stub_call,
+    '__getattr__': _stub_getattr,
+    '__iter__': lambda self: iter([]),
+    '__enter__': lambda self: self,
+    '__exit__': lambda self, *args: False,
+})
+
+
+def stub_class(name):
+    return _StubMeta(str(name), (Stub,), {'_decorator': True})
+
+
+class StubModule(types.ModuleType):
+
+    def __getattr__(self, attr):
+        if attr.startswith('__'):
+            raise AttributeError(attr)
+        return stub_class(attr)
+
+
+class StubFinder(object):
+    """
+    Meta path finder creating stub modules for stubbed packages.
+    """
+
+    def __init__(self, packages=STUBBED):
+        self.packages = packages
+        self.loaded = []
+
+    def _stubbed(self, fullname):
+        return fullname.split('.')[0] in self.packages
+
+    # Python 3
+    def find_spec(self, fullname, path=None, target=None):
+        if not self._stubbed(fullname):
+            return None
+        import importlib.machinery
+        return importlib.machinery.ModuleSpec(fullname, self, is_package=True)
+
+    def create_module(self, spec):
+        return self._create(spec.name)
+
+    def exec_module(self, module):
+        pass
+
+    # Python 2
+    def find_module(self, fullname, path=None):
+        return self if self._stubbed(fullname) else None
+
+    def load_module(self, fullname):
+        if fullname not in sys.modules:
+            sys.modules[fullname] = self._create(fullname)
+        return sys.modules[fullname]
+
+    def _create(self, fullname):
+        module = StubModule(fullname)
+        module.__path__ = []
+        module.__file__ = '<stub>'
+        module.__loader__ = self
+        self.loaded.append(fullname)
+        return module
+
+
+def install(packages=STUBBED):
+    """
+    Install stub finder ahead of the regular import system.
+    """
+    finder = StubFinder(packages)
+    sys.meta_path.insert(0, finder)
+    return finder
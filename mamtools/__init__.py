@@ -16,30 +16,131 @@ __version__ = "0.4.4"
 __license__ = "MIT"
 
 
+import types
+import importlib
 import traceback
 import maya
+import maya.mel
 from maya import cmds
-import mampy
-from mamtools import camera, delete, display, mesh, sort_outliner, pivots
 
-import maya.OpenMaya as OpenMaya
 
-optionVar = mampy.optionVar()
+class _LazyModule(types.ModuleType):
+    """
+    Placeholder importing module `name` on first attribute access.
+
+    Once loaded the placeholder replaces itself with the real module in
+    this package namespace under `alias`. Names bound before that, as with
+    ``from mamtools import mesh``, keep the placeholder. It forwards
+    attribute access but is not in ``sys.modules`` so ``reload`` rejects
+    it, use ``import mamtools.mesh as mesh`` to get the real module.
+    """
+
+    def __init__(self, name, alias):
+        super(_LazyModule, self).__init__(name)
+        self.__dict__['_alias'] = alias
+        self.__dict__['_module'] = None
+
+    def _load(self):
+        if self._module is None:
+            self.__dict__['_module'] = importlib.import_module(self.__name__)
+            globals()[self._alias] = self._module
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __dir__(self):
+        return dir(self._load())
+
+
+class _LazyOptionVar(object):
+    """
+    Placeholder for ``mampy.optionVar`` created on first use.
+    """
+
+    def __init__(self):
+        self._option_var = None
+
+    def _load(self):
+        if self._option_var is None:
+            self._option_var = mampy.optionVar()
+        return self._option_var
+
+    def __getitem__(self, key):
+        return self._load()[key]
+
+    def __setitem__(self, key, value):
+        self._load()[key] = value
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+
+# Submodules and heavy dependencies are imported when first used to keep
+# maya startup fast.
+mampy = _LazyModule('mampy', 'mampy')
+OpenMaya = _LazyModule('maya.OpenMaya', 'OpenMaya')
+for _name in ['camera', 'delete', 'display', 'mesh', 'sort_outliner', 'pivots']:
+    globals()[_name] = _LazyModule('{}.{}'.format(__name__, _name), _name)
+del _name
+
+optionVar = _LazyOptionVar()
 
 
 lasso_callback = None
 
 
+# Parsed command strings and whether mel procs exist, cached per session
+# and cleared when plugins are loaded or unloaded.
+_mel_commands = {}
+_mel_exists = {}
+_plugin_callbacks = []
+
+
+def clear_mel_cache(*args):
+    _mel_commands.clear()
+    _mel_exists.clear()
+
+
+def _add_plugin_callbacks():
+    if _plugin_callbacks:
+        return
+    for message in [OpenMaya.MSceneMessage.kAfterPluginLoad,
+                    OpenMaya.MSceneMessage.kAfterPluginUnload]:
+        _plugin_callbacks.append(
+            OpenMaya.MSceneMessage.addStringArrayCallback(message, clear_mel_cache)
+        )
+
+
+def resolve_mel(command):
+    """
+    Return (native, commands) for a ``;`` separated command string.
+
+    native is True if every command is a mel proc or command, otherwise
+    commands are run through ``dR_DoCmd``.
+    """
+    if command not in _mel_commands:
+        _add_plugin_callbacks()
+        commands = [cmd.strip() for cmd in command.split(';') if cmd.strip()]
+        names = [cmd.split(' ')[0] for cmd in commands]
+        for name in names:
+            if name not in _mel_exists:
+                _mel_exists[name] = bool(maya.mel.eval('exists {}'.format(name)))
+        _mel_commands[command] = (all(_mel_exists[name] for name in names), commands)
+    return _mel_commands[command]
+
+
 def mel(command):
     try:
-        if all([
-            maya.mel.eval('exists {}'.format(cmd.lstrip().split(' ')[0]))
-            for cmd in command.split(';')
-        ]):
+        native, commands = resolve_mel(command)
+        if native:
             maya.mel.eval('{};'.format(command))
         else:
-            for cmd in [i for i in command.split(';') if i]:
-                maya.mel.eval('dR_DoCmd("{}");'.format(cmd.lstrip()))
+            for cmd in commands:
+                maya.mel.eval('dR_DoCmd("{}");'.format(cmd))
     except (RuntimeError, SyntaxError):
         traceback.print_exc()
         print('failed to execute: {}'.format(command))
@@ -0,0 +1,144 @@
+"""
+Bulk Operations
+
+Run commands over large lists of nodes in as few calls as possible. Work
+is split in chunks sized to keep maya responsive while progress is shown
+in the main progress bar, attribute writes are grouped by value.
+"""
+import time
+import logging
+import collections
+
+from maya import cmds, mel
+
+from mampy.utils import undoable
+
+
+logger = logging.getLogger(__name__)
+
+
+class ChunkSizer(object):
+    """
+    Adapt chunk size so each chunk takes about `target` seconds.
+    """
+
+    def __init__(self, size=500, target=0.25, minimum=1, maximum=50000):
+        self.size = size
+        self.target = target
+        self.minimum = minimum
+        self.maximum = maximum
+
+    def update(self, count, elapsed):
+        """
+        Update size from time it took to process `count` items.
+        """
+        if elapsed <= 0:
+            ideal = self.size * 2
+        else:
+            ideal = count / elapsed * self.target
+        # Average with current size to avoid jumping on single slow chunks.
+        size = int((self.size + ideal) * 0.5)
+        self.size = max(self.minimum, min(self.maximum, size))
+        return self.size
+
+
+class ProgressBar(object):
+    """
+    Wrapper around maya main progress bar, does nothing when disabled or
+    in batch mode.
+    """
+
+    def __init__(self, title, total, enabled=True):
+        self.title = title
+        self.total = total
+        self.bar = None
+        if enabled and not cmds.about(batch=True):
+            self.bar = mel.eval('$tmp = $gMainProgressBar')
+
+    def __enter__(self):
+        if self.bar:
+            cmds.progressBar(self.bar, e=True, beginProgress=True, isInterruptable=True,
+                             status=self.title, maxValue=max(self.total, 1))
+        return self
+
+    def __exit__(self, *args):
+        if self.bar:
+            cmds.progressBar(self.bar, e=True, endProgress=True)
+
+    def step(self, count):
+        """
+        Advance bar by count, returns False if the user cancelled.
+        """
+        if not self.bar:
+            return True
+        cmds.progressBar(self.bar, e=True, step=count)
+        return not cmds.progressBar(self.bar, q=True, isCancelled=True)
+
+
+def run_chunked(func, items, title='Processing', sizer=None, progress=True):
+    """
+    Call `func` with chunks of `items`, returns number of items processed.
+
+    Chunk size adapts to how long each call takes. Progress is shown in
+    the main progress bar and can be cancelled with esc.
+    """
+    items = list(items)
+    sizer = sizer or ChunkSizer()
+    done = 0
+
+    with ProgressBar(title, len(items), progress) as bar:
+        while done < len(items):
+            chunk = items[done:done + sizer.size]
+            start = time.time()
+            func(chunk)
+            sizer.update(len(chunk), time.time() - start)
+            done += len(chunk)
+            if not bar.step(len(chunk)):
+                logger.warn('{} cancelled after {} of {}.'.format(title, done, len(items)))
+                break
+    return done
+
+
+class AttributeBatch(object):
+    """
+    Collect attribute writes and apply them grouped by attribute and value.
+
+    Attributes with a command in `setters` are set on all nodes sharing a
+    value with a single call, others fall back to one ``setAttr`` per plug.
+    Everything is applied in one undo chunk.
+    """
+
+    setters = {
+        'visibility': lambda nodes, value: (cmds.showHidden if value else cmds.hide)(nodes),
+        'xRay': lambda nodes, value: cmds.displaySurface(nodes, xRay=value),
+    }
+
+    def __init__(self):
+        self._pending = collections.OrderedDict()
+
+    def __len__(self):
+        return sum(len(nodes) for nodes in self._pending.values())
+
+    def set(self, node, attr, value):
+        if isinstance(value, list):
+            value = tuple(value)
+        self._pending.setdefault((attr, value), []).append(str(node))
+
+    def apply(self):
+        """
+        Apply pending writes, returns number of commands issued.
+        """
+        calls = 0
+        with undoable():
+            for (attr, value), nodes in self._pending.items():
+                if attr in self.setters:
+                    self.setters[attr](nodes, value)
+                    calls += 1
+                    continue
+
+                values = value if isinstance(value, tuple) else (value,)
+                for node in nodes:
+                    cmds.setAttr('{}.{}'.format(node, attr), *values)
+                calls += len(nodes)
+        self._pending.clear()
+        return calls
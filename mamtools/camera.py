@@ -92,7 +92,7 @@ def viewport_snap():
         negative = False
         axis = axis[-1]
 
-    print 'negative', negative
+    logger.debug('negative {}'.format(negative))
 
     if camera.is_ortho():
         camera.attr['orthographic'] = False
@@ -4,23 +4,60 @@ import logging
 import collections
 from functools import partial
 
+import numpy as np
+
 import maya.cmds as cmds
 from maya.api.OpenMaya import MFn
 
 import mampy
-from mampy.core.datatypes import Line3D
 from mampy.utils import undoable, repeatable
 from mampy.core.exceptions import NothingSelected, InvalidSelection
-from mampy.core.components import (SingleIndexComponent, MeshVert,
-                                   get_outer_and_inner_edges_from_edge_loop)
+from mampy.core.components import SingleIndexComponent
 from mampy.core.selectionlist import ComponentList
 
+from mamtools import bulk, geometry, meshdata, topology
+
 
 logger = logging.getLogger(__name__)
 
 
 __all__ = ['delete', 'history', 'collapse', 'merge_faces', 'merge_verts',
-           'transforms', 'unbevel']
+           'transforms', 'unbevel', 'weld']
+
+
+DeleteStep = collections.namedtuple('DeleteStep', 'type direct pinned')
+
+# Component types in the order they are deleted, other types and nodes
+# are deleted last.
+DELETE_ORDER = [MFn.kMeshEdgeComponent, MFn.kMeshVertComponent, MFn.kMeshPolygonComponent]
+
+
+def plan_delete(items):
+    """
+    Group (object, type, names) items into as few delete steps as possible.
+
+    Each type is deleted with one command over all objects. Names on an
+    object that already lost components in an earlier step are returned
+    as `pinned`, their indices must be resolved again before deleting.
+    Node deletes use type None.
+    """
+    grouped = collections.OrderedDict()
+    for obj, kind, names in items:
+        grouped.setdefault(kind, []).append((obj, names))
+
+    def rank(kind):
+        if kind in DELETE_ORDER:
+            return DELETE_ORDER.index(kind)
+        return len(DELETE_ORDER) + (kind is None)
+
+    plan, touched = [], set()
+    for kind in sorted(grouped, key=rank):
+        direct, pinned = [], []
+        for obj, names in grouped[kind]:
+            (pinned if obj in touched else direct).extend(names)
+        plan.append(DeleteStep(kind, direct, pinned))
+        touched.update(obj for obj, _ in grouped[kind])
+    return plan
 
 
 @undoable()
@@ -31,20 +68,38 @@ def delete(cv=False):
     if not selected:
         return logger.warn('Nothing to delete.')
 
+    items = []
     for each in selected:
         if isinstance(each, SingleIndexComponent):
-            # Try to delete supported types if that fails uss default delete in
-            # maya
-            try:
-                {
-                    MFn.kMeshEdgeComponent: partial(cmds.polyDelEdge, each.cmdslist(), cv=cv),
-                    MFn.kMeshVertComponent: partial(cmds.polyDelVertex, each.cmdslist()),
-                    MFn.kMeshPolygonComponent: partial(cmds.polyDelFacet, each.cmdslist()),
-                }[each.type]()
-            except KeyError:
-                cmds.delete(each.cmdslist())
+            items.append((each.dagpath.fullPathName(), each.type, each.cmdslist()))
         else:
-            cmds.delete(str(each))
+            items.append((str(each), None, [str(each)]))
+    plan = plan_delete(items)
+
+    # Keep components for later steps in sets so maya tracks their indices
+    # through earlier deletes.
+    pins = {}
+    try:
+        for idx, step in enumerate(plan):
+            if step.pinned:
+                pins[idx] = cmds.sets(step.pinned, name='MAM_DELETE_PIN')
+
+        for idx, step in enumerate(plan):
+            names = list(step.direct)
+            if idx in pins:
+                names.extend(cmds.sets(pins[idx], q=True) or [])
+            if not names:
+                continue
+            # Use default delete in maya for unsupported types.
+            {
+                MFn.kMeshEdgeComponent: partial(cmds.polyDelEdge, cv=cv),
+                MFn.kMeshVertComponent: cmds.polyDelVertex,
+                MFn.kMeshPolygonComponent: cmds.polyDelFacet,
+            }.get(step.type, cmds.delete)(names)
+    finally:
+        pins = [pin for pin in pins.values() if cmds.objExists(pin)]
+        if pins:
+            cmds.delete(pins)
     cmds.select(cl=True)
 
 
@@ -52,27 +107,53 @@ def delete(cv=False):
 def history():
     """Delete history on selected objects, works on hilited objects."""
     with undoable():
-        for each in mampy.daglist():
-            cmds.delete(str(each.transform), ch=True)
+        transforms = collections.OrderedDict.fromkeys(
+            str(each.transform) for each in mampy.daglist()
+        )
+        bulk.run_chunked(partial(cmds.delete, ch=True), transforms, 'Deleting history')
 
 
 @undoable()
 @repeatable
-def collapse():
+def collapse(tolerance=0.001):
+    """
+    Collapse selection to its center.
+
+    Edge selections are collapsed per connected group of edges. Centers
+    for all groups are solved in one pass and written once per object.
+    """
     selected = mampy.complist()
     if not selected:
         return logger.warn('Invalid component selection.')
 
+    writer = meshdata.PointWriter()
     for comp in selected:
         if comp.type == MFn.kMeshEdgeComponent:
-            for comp in comp.get_connected_components():
-                for edge in comp.indices:
-                    vert = MeshVert.create(comp.dagpath).add(comp.vertices[edge])
-                    vert.translate(t=list(comp.bbox.center)[:3], ws=True)
+            mesh_topology = meshdata.get_topology(comp.dagpath)
+            pairs = mesh_topology.edge_vertices[np.array(list(comp.indices), dtype=int)]
+            vertices, local = np.unique(pairs, return_inverse=True)
+            local = local.reshape(-1, 2)
+            labels = topology.connected_labels(len(vertices), local[:, 0], local[:, 1])
+            _, labels = np.unique(labels, return_inverse=True)
         else:
-            vert = comp.to_vert()
-            vert.translate(t=list(vert.bbox.center)[:3], ws=True)
-        cmds.polyMergeVertex(comp.cmdslist(), distance=0.001)
+            if comp.type == MFn.kMeshPolygonComponent:
+                mesh_topology = meshdata.get_topology(comp.dagpath)
+                _, vertices = topology.gather(mesh_topology.face_offsets, mesh_topology.connects,
+                                              list(comp.indices))
+            elif comp.type == MFn.kMeshVertComponent:
+                vertices = list(comp.indices)
+            else:
+                vertices = list(comp.to_vert().indices)
+            vertices = np.unique(np.asarray(vertices, dtype=int))
+            labels = np.zeros(len(vertices), dtype=int)
+
+        points = writer.get_points(comp.dagpath, vertices)
+        centers = geometry.group_centers(points, labels.ravel())
+        writer.set(comp.dagpath, vertices, centers[labels.ravel()])
+
+    # Points must be in place before welding.
+    writer.commit()
+    weld(selected, tolerance)
     cmds.select(cl=True)
 
 
@@ -93,33 +174,84 @@ def merge_faces():
         # We must first collect all necessary elements before we operate on them.
         # This is to avoid getting uncertain information due to indices changing
         # when performing the delete function.
-        border_vertices = ComponentList()
-        internal_edges = ComponentList()
-        for connected_face in face.get_connected_components():
-            border_vertices.append(connected_face.to_vert(border=True))
-            internal_edges.append(connected_face.to_edge(internal=True))
+        mesh_topology = meshdata.get_topology(face.dagpath)
+        faces, groups = mesh_topology.face_groups(list(face.indices))
+        edge_groups, edges, shared = mesh_topology.group_edges(faces, groups)
+
+        border = shared == 1
+        border_vertices = [[] for _ in range(groups.max() + 1)]
+        for group, pair in zip(edge_groups[border], mesh_topology.edge_vertices[edges[border]]):
+            border_vertices[group].extend(pair)
+        internal = edges[~border]
+        if not len(internal):
+            continue
 
         # We only delete once per object to perserve as much information as
         # possible.
-        cmds.polyDelEdge(internal_edges.cmdslist())
+        shape = face.dagpath.fullPathName()
+        cmds.polyDelEdge(meshdata.component_ranges(shape, 'e', internal))
         # Collect the most shared face on the border vertices to get new faces
         # from the delete operation.
-        for border_vert in border_vertices:
-            counter = collections.Counter()
-            for idx in border_vert.indices:
-                f = border_vert.new().add(idx).to_face()
-                counter.update(f.indices)
-            new_faces.append(face.new().add(counter.most_common(1).pop()[0]))
+        border_vertices = [np.unique(v) for v in border_vertices]
+        new = topology.most_shared_faces(meshdata.get_topology(face.dagpath), border_vertices)
+        new_faces.append(face.new().add(new[new >= 0].tolist()))
     # Select and be happy!
     cmds.select(new_faces.cmdslist())
 
 
+def weld(components, tolerance=0.001, preview=False):
+    """
+    Weld verts of components that are closer than tolerance.
+
+    Clusters are found with the hash grid in :func:`geometry.weld_clusters`
+    and reported before anything is changed. Clustered verts are moved to
+    their cluster center in one write and merged with one call per object.
+    With `preview` clustered verts are selected instead. Returns number of
+    clusters and number of verts removed.
+    """
+    if not tolerance > 0:
+        raise ValueError('Weld tolerance must be above zero, got {}.'.format(tolerance))
+    writer = meshdata.PointWriter()
+    merge_list = []
+    clusters, removed = 0, 0
+    for comp in components:
+        vert = comp if comp.is_vert() else comp.to_vert()
+        indices = np.array(list(vert.indices), dtype=int)
+        points = writer.get_points(comp.dagpath, indices)
+
+        labels, centers, distance = geometry.weld_labels(points, tolerance)
+
+        found, merged = geometry.cluster_counts(labels)
+        if not merged:
+            continue
+        clusters, removed = clusters + found, removed + merged
+
+        welded = np.bincount(labels)[labels] > 1
+        writer.set(comp.dagpath, indices[welded], centers[labels[welded]])
+        merge_list.append((vert.new().add(indices[welded].tolist()), distance))
+
+    logger.info('Weld found {} clusters, {} verts will be removed.'.format(clusters, removed))
+    if preview:
+        selection = ComponentList()
+        for comp, _ in merge_list:
+            selection.append(comp)
+        cmds.select(selection.cmdslist(), r=True)
+        return clusters, removed
+
+    # Clustered verts are coincident after the write and other centers are
+    # further apart than the merge distance, which is below tolerance.
+    writer.commit()
+    for comp, distance in merge_list:
+        cmds.polyMergeVertex(comp.cmdslist(), distance=distance, ch=True)
+    return clusters, removed
+
+
 @undoable()
 @repeatable
-def merge_verts(move):
+def merge_verts(move, tolerance=0.001, preview=False):
     """Merges verts to first selection."""
     ordered_selection = mampy.complist(os=True)
-    if move or len(ordered_selection) == 2:
+    if not preview and (move or len(ordered_selection) == 2):
         if len(next(iter(ordered_selection))) > 1:
             pass
         else:
@@ -129,15 +261,16 @@ def merge_verts(move):
             else:
                 pos = ordered_selection.pop().bbox.center
             cmds.xform(ordered_selection.cmdslist(), t=list(pos)[:3], ws=True)
-    cmds.polyMergeVertex(ordered_selection.cmdslist(), distance=0.001, ch=True)
+    weld(mampy.complist(), tolerance, preview)
 
 
 @undoable()
 @repeatable
 def transforms(translate=False, rotate=False, scale=False):
     """Small function to control transform freezes."""
-    transforms = [str(dp.transform) for dp in mampy.daglist()]
-    cmds.makeIdentity(transforms, t=translate, r=rotate, s=scale, apply=True)
+    transforms = collections.OrderedDict.fromkeys(str(dp.transform) for dp in mampy.daglist())
+    freeze = partial(cmds.makeIdentity, t=translate, r=rotate, s=scale, apply=True)
+    bulk.run_chunked(freeze, transforms, 'Freezing transforms')
 
 
 @undoable()
@@ -151,23 +284,51 @@ def unbevel():
     to get confused.
     """
     selected = mampy.complist()
+    writer = meshdata.PointWriter()
+    loops, lines, merge = [], [], collections.OrderedDict()
     for edge in selected:
+        if not edge.type == MFn.kMeshEdgeComponent:
+            continue
+        mesh_topology = meshdata.get_topology(edge.dagpath)
+        indices = np.array(list(edge.indices), dtype=int)
+        pairs = mesh_topology.edge_vertices[indices]
+        outer_verts = []
+        for inner_verts, closed in topology.order_loops(pairs):
+            if closed:
+                continue
+            # Outer edges continue the edge loop from both ends of the bevel.
+            outer_edges = []
+            for end in inner_verts[0], inner_verts[-1]:
+                end_edge = indices[(pairs == end).any(axis=1)][0]
+                outer_edges.append(mesh_topology.loop_continuation(end, end_edge))
+            if -1 in outer_edges:
+                continue
+
+            outer_verts.append(mesh_topology.edge_vertices[outer_edges].ravel())
+            loops.append((edge.dagpath, inner_verts))
+            merge.setdefault(edge.dagpath.fullPathName(), []).append(inner_verts)
+
+        # Only the outer edge verts are read, one query per object.
+        if outer_verts:
+            points = writer.get_points(edge.dagpath, np.concatenate(outer_verts))
+            lines.extend(points.reshape(-1, 4, 3))
+
+    if not loops:
+        return logger.warn('Invalid edge selection.')
+
+    # Solve all loops at once and move inner verts to the midpoint of the
+    # shortest line between the outer edges.
+    lines = np.array(lines, dtype=float)
+    midpoints = geometry.closest_line_midpoints(lines[:, 0], lines[:, 1], lines[:, 2], lines[:, 3])
+    for (dagpath, inner_verts), midpoint in zip(loops, midpoints):
+        writer.set(dagpath, inner_verts, midpoint)
 
-        # cmds.select(edge.cmdslist(), r=True)
-        merge_list = ComponentList()
-        for each in edge.get_connected_components():
-            outer_edges, inner_verts = get_outer_and_inner_edges_from_edge_loop(each)
-
-            edge1, edge2 = outer_edges
-            line1 = Line3D(edge1[0].bbox.center, edge1[1].bbox.center)
-            line2 = Line3D(edge2[0].bbox.center, edge2[1].bbox.center)
-            intersection = line1.shortest_line_to_other(line2)
-            inner_verts.translate(t=intersection.sum() * 0.5, ws=True)
-            merge_list.append(inner_verts)
-
-        # Merge components on object after all operation are done. Mergin
-        # before will change vert ids and make people sad.
-        cmds.polyMergeVertex(merge_list.cmdslist(), distance=0.001)
+    # Merge components on objects after all points are written. Merging
+    # before will change vert ids and make people sad.
+    writer.commit()
+    for shape, merge_list in merge.items():
+        cmds.polyMergeVertex(meshdata.component_ranges(shape, 'vtx', np.concatenate(merge_list)),
+                             distance=0.001)
 
 
 if __name__ == '__main__':
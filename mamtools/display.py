@@ -3,19 +3,96 @@
 import logging
 
 from maya import cmds
-from maya.api.OpenMaya import MFn
-
+import maya.api.OpenMaya as api
 
+from PySide.QtCore import QObject, QEvent
 from PySide.QtGui import QDockWidget
+import shiboken
 
 import mampy
 from mampy.pyside.utils import get_maya_main_window
 
+from mamtools import bulk, scene
+
 
 logger = logging.getLogger(__name__)
 # logger.setLevel(logging.DEBUG)
 
 
+class DisplayState(object):
+    """
+    Cached global ``polyOptions`` display flags.
+
+    Querying a flag returns one value per selected mesh, so flags are only
+    queried the first time they are needed and then tracked as they are
+    applied. Selection changes and new scenes drop the cache.
+    """
+
+    # Flags in a group are modes, setting one turns the others off.
+    exclusive = [
+        ('hardEdge', 'softEdge', 'allEdges'),
+        ('wireBackCulling', 'backCulling', 'hardBack', 'fullBack'),
+    ]
+
+    def __init__(self):
+        self._state = {}
+        self._callbacks = []
+
+    def install(self):
+        if self._callbacks:
+            return
+        self._callbacks = [
+            api.MEventMessage.addEventCallback('SelectionChanged', self.invalidate),
+            api.MSceneMessage.addCallback(api.MSceneMessage.kAfterNew, self.invalidate),
+            api.MSceneMessage.addCallback(api.MSceneMessage.kAfterOpen, self.invalidate),
+        ]
+
+    def uninstall(self):
+        if self._callbacks:
+            api.MMessage.removeCallbacks(self._callbacks)
+        self._callbacks = []
+
+    def invalidate(self, *args):
+        self._state.clear()
+
+    def get(self, flag):
+        """
+        Return True if flag is on for all selected meshes.
+        """
+        self.install()
+        if flag not in self._state:
+            state = cmds.polyOptions(gl=True, q=True, **{flag: True})
+            self._state[flag] = all(state) if isinstance(state, list) else bool(state)
+        return self._state[flag]
+
+    def apply(self, **flags):
+        """
+        Set all given flags with one ``polyOptions`` call.
+        """
+        cmds.polyOptions(gl=True, **flags)
+        for flag, value in flags.items():
+            for group in self.exclusive:
+                if flag in group and value:
+                    self._state.update(dict.fromkeys(group, False))
+            self._state[flag] = bool(value)
+
+    def toggle(self, flag, off=None):
+        """
+        Turn flag on unless already on, then turn it off or set `off` flag
+        instead. Returns new state of flag.
+        """
+        if not self.get(flag):
+            self.apply(**{flag: True})
+        elif off is None:
+            self.apply(**{flag: False})
+        else:
+            self.apply(**{off: True})
+        return self._state[flag]
+
+
+display_state = DisplayState()
+
+
 def toggle_default_material():
     current_panel = cmds.getPanel(withFocus=True)
     state = cmds.modelEditor(current_panel, q=True, useDefaultMaterial=True)
@@ -42,34 +119,98 @@ def toggle_occlusion():
     cmds.setAttr('hardwareRenderingGlobals.ssaoEnable', not(state))
 
 
-def toggle_raised_dock():
-    main_window = get_maya_main_window()
-    window_main_docks = sorted([
-        'Tool Settings',
-        'Modeling Toolkit',
-        'Attribute Editor',
-        'Channel Box / Layer Editor'
-    ])
-    print window_main_docks
-    widgets = {}
-    for dock in main_window.findChildren(QDockWidget):
-        title = dock.windowTitle()
-        if title not in window_main_docks:
-            continue
-        if dock.isVisible():
-            widgets[title] = dock
-        else:
-            window_main_docks.remove(title)
+DEFAULT_DOCK_CYCLE = sorted([
+    'Tool Settings',
+    'Modeling Toolkit',
+    'Attribute Editor',
+    'Channel Box / Layer Editor'
+])
 
-    for k, i in widgets.iteritems():
-        if not i.widget().visibleRegion().isEmpty():
-            idx = window_main_docks.index(k)
 
-    try:
-        dock_widget = widgets[window_main_docks[idx + 1]]
-    except IndexError:
-        dock_widget = widgets[window_main_docks[0]]
-    dock_widget.raise_()
+class DockRegistry(QObject):
+    """
+    Main window docks in a cycle list.
+
+    Docks are looked up once, the main window is then watched for docks
+    being added, removed or destroyed and only searched again after that.
+    Found docks are held until one of them is destroyed.
+    """
+
+    TRACKED = 'mamtoolsDockTracked'
+
+    def __init__(self, window, cycle=None):
+        super(DockRegistry, self).__init__(window)
+        self.window = window
+        self.cycle = list(cycle or DEFAULT_DOCK_CYCLE)
+        self._docks = {}
+        self._stale = True
+        window.installEventFilter(self)
+
+    def eventFilter(self, obj, event):
+        if event.type() in (QEvent.ChildAdded, QEvent.ChildRemoved):
+            if isinstance(event.child(), QDockWidget):
+                self._stale = True
+        return False
+
+    def _dock_destroyed(self, *args):
+        self._docks = {}
+        self._stale = True
+
+    def set_cycle(self, titles):
+        self.cycle = list(titles)
+        self._stale = True
+
+    def refresh(self):
+        docks = {}
+        for dock in self.window.findChildren(QDockWidget):
+            title = dock.windowTitle()
+            if title not in self.cycle:
+                continue
+            docks[title] = dock
+            # Connect each dock once, the flag is kept on the dock itself as
+            # its python wrapper can change between refreshes.
+            if not dock.property(self.TRACKED):
+                dock.setProperty(self.TRACKED, True)
+                dock.destroyed.connect(self._dock_destroyed)
+        self._docks = docks
+        self._stale = False
+
+    def docks(self):
+        """
+        Return docks in cycle order, refreshing only when docks changed.
+        """
+        if self._stale or not all(shiboken.isValid(d) for d in self._docks.values()):
+            self.refresh()
+        return [(title, self._docks[title]) for title in self.cycle if title in self._docks]
+
+
+_dock_registry = None
+
+
+def get_dock_registry():
+    global _dock_registry
+    if _dock_registry is None:
+        _dock_registry = DockRegistry(get_maya_main_window())
+    return _dock_registry
+
+
+def toggle_raised_dock(cycle=None):
+    """
+    Raise next visible dock in cycle list after the one currently raised.
+    """
+    registry = get_dock_registry()
+    if cycle is not None and not list(cycle) == registry.cycle:
+        registry.set_cycle(cycle)
+
+    docks = [dock for _, dock in registry.docks() if dock.isVisible()]
+    if not docks:
+        return
+
+    idx = -1
+    for i, dock in enumerate(docks):
+        if not dock.widget().visibleRegion().isEmpty():
+            idx = i
+    docks[(idx + 1) % len(docks)].raise_()
 
 
 def is_model_panel(panel):
@@ -80,54 +221,44 @@ def unhide_all(unhide_types=None):
     """
     unhide all groups and mesh objects in the scene.
     """
-    for trans in mampy.daglist(transforms=True):
-        if trans.shape is None or trans.shape.type == MFn.kMesh:
-            trans.attr['visibility'] = True
+    # Visibility is not tracked by the index, a fresh build reads it.
+    scene_index = scene.current_index()
+    if scene_index is None:
+        scene_index = scene.get_index()
+    else:
+        scene_index.refresh_visibility()
+    hidden = scene_index.find('transform', shape_types=(None, 'mesh'), hidden=True)
+
+    batch = bulk.AttributeBatch()
+    for trans in hidden:
+        batch.set(trans, 'visibility', True)
+    batch.apply()
 
 
 def visibility_toggle():
     """
     Toggle visibility of selected objects.
     """
+    batch = bulk.AttributeBatch()
     for dag in mampy.daglist():
-        dag.attr['visibility'] = not(dag.attr['visibility'])
+        batch.set(dag, 'visibility', not(dag.attr['visibility']))
+    batch.apply()
 
 
 def display_edges(show_hard=True):
-    edge = {'hardEdge': True} if show_hard else {'softEdge': True}
-    is_hard_edge = cmds.polyOptions(gl=True, q=True, **edge)
-    if not all(is_hard_edge):
-        cmds.polyOptions(gl=True, **edge)
-    else:
-        cmds.polyOptions(gl=True, allEdges=True)
+    display_state.toggle('hardEdge' if show_hard else 'softEdge', off='allEdges')
 
 
 def display_vertex():
-    is_vertex_visible = cmds.polyOptions(gl=True, q=True, displayVertex=True)
-    if not all(is_vertex_visible):
-        cmds.polyOptions(gl=True, displayVertex=True)
-    else:
-        cmds.polyOptions(gl=True, displayVertex=False)
+    display_state.toggle('displayVertex')
 
 
 def display_border_edges():
-    is_border_edge_visible = cmds.polyOptions(
-        gl=True, q=True, displayBorder=True
-    )
-    if not all(is_border_edge_visible):
-        cmds.polyOptions(gl=True, displayBorder=True)
-    else:
-        cmds.polyOptions(gl=True, displayBorder=False)
+    display_state.toggle('displayBorder')
 
 
 def display_map_border():
-    is_map_border_visible = cmds.polyOptions(
-        gl=True, q=True, displayMapBorder=True,
-    )
-    if not all(is_map_border_visible):
-        cmds.polyOptions(gl=True, displayMapBorder=True)
-    else:
-        cmds.polyOptions(gl=True, displayMapBorder=False)
+    display_state.toggle('displayMapBorder')
 
 
 def display_textures():
@@ -147,10 +278,17 @@ def display_xray():
     if not selected:
         return logger.warn('Nothing selected.')
 
-    for dag in selected:
-        if dag.shape and dag.shape.type == MFn.kMesh:
-            state = cmds.displaySurface(str(dag.shape), q=True, xRay=True).pop()
-            cmds.displaySurface(str(dag.shape), xRay=not(state))
+    names = [str(dag) for dag in selected]
+    shapes = cmds.ls(names, type='mesh', long=True) or []
+    shapes.extend(cmds.listRelatives(names, shapes=True, type='mesh', noIntermediate=True,
+                                     fullPath=True) or [])
+    if not shapes:
+        return
+
+    batch = bulk.AttributeBatch()
+    for shape, state in zip(shapes, cmds.displaySurface(shapes, q=True, xRay=True)):
+        batch.set(shape, 'xRay', not(state))
+    batch.apply()
 
 
 def shaded_toggle():
@@ -196,11 +334,7 @@ def wireframe_backface_culling():
     """
     Toggles backface culling on/off.
     """
-    is_wire_culling = cmds.polyOptions(gl=True, q=True, wireBackCulling=True)
-    if not all(is_wire_culling):
-        cmds.polyOptions(gl=True, wireBackCulling=True)
-    else:
-        cmds.polyOptions(gl=True, backCulling=True)
+    display_state.toggle('wireBackCulling', off='backCulling')
 
 
 def view_outliner(floating=False):
@@ -0,0 +1,512 @@
+"""
+Geometry Solvers
+
+Vectorized solvers used by the mesh tools. Everything in here works on
+plain numpy arrays so it can be run and compared without a maya session.
+"""
+import math
+import itertools
+import collections
+
+import numpy as np
+
+from mamtools import topology
+
+
+def to_array(points, indices=None):
+    """
+    Return given point sequence as a (n, 3) float array.
+
+    Accepts anything iterable yielding point like objects, such as
+    ``MPointArray`` or lists of ``MPoint``.
+    """
+    if indices is not None:
+        points = [points[i] for i in indices]
+    array = np.array([tuple(p)[:3] for p in points], dtype=float)
+    return array.reshape(-1, 3)
+
+
+def euler_matrix(rotation):
+    """
+    Return 3x3 matrix for xyz ordered euler rotation in radians.
+
+    Follows maya convention where vectors are treated as rows, ``v * M``.
+    """
+    x, y, z = rotation
+    cx, sx = math.cos(x), math.sin(x)
+    cy, sy = math.cos(y), math.sin(y)
+    cz, sz = math.cos(z), math.sin(z)
+    rx = np.array([[1, 0, 0], [0, cx, sx], [0, -sx, cx]])
+    ry = np.array([[cy, 0, -sy], [0, 1, 0], [sy, 0, cy]])
+    rz = np.array([[cz, sz, 0], [-sz, cz, 0], [0, 0, 1]])
+    return rx.dot(ry).dot(rz)
+
+
+def start_vertex_scores(points, plane_vector):
+    """
+    Score every cyclic rotation of an ordered point loop.
+
+    Score ``k`` is the dot product sum for the loop rotated so that point
+    ``-k % n`` is first. Points are rotated by the euler matrix of
+    `plane_vector` and then spun around z by their position in the loop.
+    The rotation sum collapses to a single complex coefficient so all
+    rotations are scored in O(n).
+    """
+    points = np.asarray(points, dtype=float)
+    n = len(points)
+    q = points.dot(euler_matrix(plane_vector))
+
+    a = points[:, 0] * q[:, 0] + points[:, 1] * q[:, 1]
+    b = points[:, 1] * q[:, 0] - points[:, 0] * q[:, 1]
+    c = points[:, 2] * q[:, 2]
+
+    theta = (math.pi * 2) / n
+    steps = np.arange(n)
+    z = np.sum((a - 1j * b) * np.exp(1j * theta * steps))
+    scores = np.real(z * np.exp(1j * theta * steps)) + c.sum()
+
+    # The loop is closed by repeating the first point at angle 2pi.
+    first = (-steps) % n
+    return scores + a[first] + c[first]
+
+
+def find_start_vertex(points, plane_vector):
+    """
+    Return position in ordered `points` of the best loop start.
+    """
+    scores = start_vertex_scores(points, plane_vector)
+    return int((-np.argmax(scores)) % len(scores))
+
+
+def find_start_vertex_reference(points, plane_vector):
+    """
+    Pure python version of :func:`find_start_vertex`.
+
+    Walks every rotation of the loop the slow way, kept as a reference to
+    check the vectorized solver against.
+    """
+    matrix = euler_matrix(plane_vector).tolist()
+    verts = collections.deque(range(len(points)))
+    greatest_sum, first = None, None
+    for _ in range(len(verts)):
+        verts.append(verts[0])
+
+        dpsum = 0
+        theta = (math.pi*2) / (len(verts)-1)
+        for idx, vert in enumerate(verts):
+            angle = theta*idx
+            point = [float(i) for i in points[vert]]
+            q = [sum(point[r] * matrix[r][col] for r in range(3)) for col in range(3)]
+            rotated = [
+                math.cos(angle)*q[0] - math.sin(angle)*q[1],
+                math.sin(angle)*q[0] + math.cos(angle)*q[1],
+                q[2],
+            ]
+            dpsum += sum(p * r for p, r in zip(point, rotated))
+
+        if greatest_sum is None or dpsum > greatest_sum:
+            greatest_sum, first = dpsum, verts[0]
+        verts.pop()
+        verts.rotate(1)
+    return first
+
+
+def plane_basis(normal):
+    """
+    Return two unit vectors spanning the plane of given normal.
+    """
+    normal = np.asarray(normal, dtype=float)
+    normal = normal / np.linalg.norm(normal)
+    helper = np.eye(3)[np.argmin(np.abs(normal))]
+    u = np.cross(normal, helper)
+    u /= np.linalg.norm(u)
+    return u, np.cross(normal, u)
+
+
+def circle_points(center, radius, r, s, count):
+    """
+    Return `count` evenly spaced points on circle spanned by `r` and `s`.
+    """
+    angles = ((math.pi*2) / count) * np.arange(count)
+    return (np.asarray(center, dtype=float) + radius * (
+        np.sin(angles)[:, None] * np.asarray(r, dtype=float) +
+        np.cos(angles)[:, None] * np.asarray(s, dtype=float)
+    ))
+
+
+def assign_by_angle(points, targets, center, normal):
+    """
+    Map `points` to `targets` by sorting both on angle around `normal`.
+
+    Returns array where item ``i`` is the index of the target given to
+    point ``i``. Sorted points and targets are paired with the cyclic offset
+    most points agree on. Ties are broken on index so the result is stable.
+    """
+    points = np.asarray(points, dtype=float)
+    targets = np.asarray(targets, dtype=float)
+    n = len(points)
+    u, v = plane_basis(normal)
+
+    def angles(array):
+        local = array - np.asarray(center, dtype=float)
+        return np.arctan2(local.dot(v), local.dot(u))
+
+    point_angles, target_angles = angles(points), angles(targets)
+    point_order = np.argsort(point_angles, kind='mergesort')
+    target_order = np.argsort(target_angles, kind='mergesort')
+    sorted_targets = target_angles[target_order]
+
+    # Find closest target rank for each point, wrapping around -pi/pi.
+    sorted_points = point_angles[point_order]
+    upper = np.searchsorted(sorted_targets, sorted_points) % n
+    lower = (upper - 1) % n
+    two_pi = math.pi * 2
+    upper_dist = np.abs((sorted_targets[upper] - sorted_points + math.pi) % two_pi - math.pi)
+    lower_dist = np.abs((sorted_targets[lower] - sorted_points + math.pi) % two_pi - math.pi)
+    closest = np.where(lower_dist <= upper_dist, lower, upper)
+
+    offset = np.argmax(np.bincount((closest - np.arange(n)) % n, minlength=n))
+    result = np.empty(n, dtype=int)
+    result[point_order] = target_order[(np.arange(n) + offset) % n]
+    return result
+
+
+def assign_by_distance(points, targets):
+    """
+    Greedily map each point, in order, to the closest unused target.
+
+    Uses a KD-tree when scipy is available. Ties on distance go to the
+    lowest target index.
+    """
+    points = np.asarray(points, dtype=float)
+    targets = np.asarray(targets, dtype=float)
+    n = len(targets)
+    used = np.zeros(n, dtype=bool)
+    result = np.empty(len(points), dtype=int)
+
+    try:
+        from scipy.spatial import cKDTree
+    except ImportError:
+        cKDTree = None
+
+    if cKDTree is None:
+        for i, point in enumerate(points):
+            distance = np.sum((targets - point)**2, axis=1)
+            distance[used] = np.inf
+            result[i] = np.argmin(distance)
+            used[result[i]] = True
+        return result
+
+    tree = cKDTree(targets)
+    for i, point in enumerate(points):
+        k = min(8, n)
+        while True:
+            distance, index = tree.query(point, k=k)
+            distance, index = np.atleast_1d(distance), np.atleast_1d(index)
+            order = np.lexsort((index, distance))
+            free = [index[j] for j in order if not used[index[j]]]
+            if free or k == n:
+                break
+            k = min(k * 2, n)
+        result[i] = free[0]
+        used[free[0]] = True
+    return result
+
+
+def assign_to_circle(points, targets, center, normal, nearest=False):
+    """
+    Return target index for each point.
+
+    Sorts on angle around the circle by default, use `nearest` to fall back
+    on greedy closest point matching.
+    """
+    if nearest:
+        return assign_by_distance(points, targets)
+    return assign_by_angle(points, targets, center, normal)
+
+
+def face_normals(points, counts, connects):
+    """
+    Return face normals scaled by twice the face area.
+
+    Polygons are fan triangulated and the triangle cross products summed,
+    which also gives a sane normal for non planar faces.
+    """
+    points = np.asarray(points, dtype=float)
+    counts = np.asarray(counts, dtype=int)
+    connects = np.asarray(connects, dtype=int)
+    faces, starts = topology.face_vertex_arrays(counts)
+    local = np.arange(len(connects)) - starts
+
+    root = points[connects[starts]]
+    following = connects[starts + (local + 1) % counts[faces]]
+    cross = np.cross(points[connects] - root, points[following] - root)
+
+    normals = np.empty((len(counts), 3))
+    for axis in range(3):
+        normals[:, axis] = np.bincount(faces, cross[:, axis], minlength=len(counts))
+    return normals
+
+
+def normalize(vectors):
+    """
+    Return unit length `vectors`, zero length vectors are left as is.
+    """
+    vectors = np.asarray(vectors, dtype=float)
+    length = np.linalg.norm(vectors, axis=-1)[..., None]
+    return np.divide(vectors, length, out=np.zeros_like(vectors), where=length > 0)
+
+
+def vertex_normals(points, counts, connects, faces=None, area=True, angle=False):
+    """
+    Return vertex indices and weighted vertex normals for mesh arrays.
+
+    Face normals are scattered to their vertices in one pass. Weight by face
+    area with `area` and by corner angle with `angle`, limit to a subset of
+    faces with `faces`.
+    """
+    points = np.asarray(points, dtype=float)
+    counts = np.asarray(counts, dtype=int)
+    connects = np.asarray(connects, dtype=int)
+    face_of, starts = topology.face_vertex_arrays(counts)
+
+    scaled = face_normals(points, counts, connects)
+    weights = np.ones(len(counts))
+    if area:
+        weights = np.linalg.norm(scaled, axis=1) * 0.5
+    corner = normalize(scaled)[face_of] * weights[face_of][:, None]
+
+    if angle:
+        local = np.arange(len(connects)) - starts
+        size = counts[face_of]
+        previous = points[connects[starts + (local - 1) % size]]
+        following = points[connects[starts + (local + 1) % size]]
+        a = normalize(previous - points[connects])
+        b = normalize(following - points[connects])
+        corner *= np.arccos(np.clip(np.sum(a * b, axis=1), -1.0, 1.0))[:, None]
+
+    if faces is not None:
+        mask = np.zeros(len(counts), dtype=bool)
+        mask[np.asarray(faces, dtype=int)] = True
+        mask = mask[face_of]
+        corner, connects = corner[mask], connects[mask]
+
+    sums = np.empty((len(points), 3))
+    for axis in range(3):
+        sums[:, axis] = np.bincount(connects, corner[:, axis], minlength=len(points))
+    vertices = np.unique(connects)
+    return vertices, normalize(sums[vertices])
+
+
+def radial_normals(points, pivot):
+    """
+    Return unit vectors pointing from `pivot` to each point.
+    """
+    return normalize(np.asarray(points, dtype=float) - np.asarray(pivot, dtype=float))
+
+
+def bounding_box_center(points):
+    """
+    Return center of the axis aligned bounding box of `points`.
+    """
+    points = np.asarray(points, dtype=float)
+    return (points.min(axis=0) + points.max(axis=0)) * 0.5
+
+
+def fit_plane(points, normals=None):
+    """
+    Return center and unit normal of a plane fitted to `points`.
+
+    With `normals` the plane is the averaged normal through the bounding box
+    center, otherwise a least squares fit through the centroid.
+    """
+    points = np.asarray(points, dtype=float)
+    if normals is not None:
+        normal = normalize(np.asarray(normals, dtype=float).sum(axis=0))
+        return bounding_box_center(points), normal
+
+    center = points.mean(axis=0)
+    _, _, vt = np.linalg.svd(points - center, full_matrices=False)
+    return center, vt[-1]
+
+
+def project_to_plane(points, center, normal):
+    """
+    Return `points` projected onto plane through `center`.
+    """
+    points = np.asarray(points, dtype=float)
+    normal = normalize(normal)
+    distance = (points - np.asarray(center, dtype=float)).dot(normal)
+    return points - distance[:, None] * normal
+
+
+def group_centers(points, labels):
+    """
+    Return bounding box center for each label group of `points`.
+
+    `labels` must run from 0 to number of groups - 1.
+    """
+    points = np.asarray(points, dtype=float)
+    labels = np.asarray(labels, dtype=int)
+    count = labels.max() + 1 if len(labels) else 0
+    low = np.full((count, 3), np.inf)
+    high = np.full((count, 3), -np.inf)
+    np.minimum.at(low, labels, points)
+    np.maximum.at(high, labels, points)
+    return (low + high) * 0.5
+
+
+def closest_line_midpoints(start1, end1, start2, end2, eps=1e-12):
+    """
+    Return midpoints of the shortest segments between pairs of lines.
+
+    Lines are given as stacked start and end points, every pair is solved
+    at once. Parallel lines use the projection of `start1` onto the second
+    line, and lines of zero length are treated as points.
+    """
+    start1, end1 = np.asarray(start1, dtype=float), np.asarray(end1, dtype=float)
+    start2, end2 = np.asarray(start2, dtype=float), np.asarray(end2, dtype=float)
+    d1, d2, r = end1 - start1, end2 - start2, start1 - start2
+
+    a = np.sum(d1 * d1, axis=1)
+    b = np.sum(d1 * d2, axis=1)
+    c = np.sum(d1 * r, axis=1)
+    e = np.sum(d2 * d2, axis=1)
+    f = np.sum(d2 * r, axis=1)
+    denom = a * e - b * b
+
+    point1, point2 = a <= eps, e <= eps
+    parallel = (denom <= eps * a * e) & ~point1 & ~point2
+    regular = ~(parallel | point1 | point2)
+
+    s, t = np.zeros(len(a)), np.zeros(len(a))
+    safe = np.where(regular, denom, 1.0)
+    s = np.where(regular, (b * f - c * e) / safe, s)
+    t = np.where(regular, (a * f - b * c) / safe, t)
+
+    # Project onto the valid line when the other is parallel or a point.
+    project2 = (parallel | point1) & ~point2
+    t = np.where(project2, f / np.where(project2, e, 1.0), t)
+    project1 = point2 & ~point1
+    s = np.where(project1, -c / np.where(project1, a, 1.0), s)
+
+    return (start1 + s[:, None] * d1 + start2 + t[:, None] * d2) * 0.5
+
+
+def group_means(points, labels):
+    """
+    Return mean point for each label group of `points`.
+    """
+    points = np.asarray(points, dtype=float)
+    labels = np.asarray(labels, dtype=int)
+    count = labels.max() + 1 if len(labels) else 0
+    sizes = np.bincount(labels, minlength=count)[:, None]
+    sums = np.column_stack([np.bincount(labels, points[:, i], minlength=count) for i in range(3)])
+    return sums / np.maximum(sizes, 1)
+
+
+# Neighbour cells to visit from each cell, every cell pair is visited once.
+_HALF_OFFSETS = np.array([
+    offset for offset in itertools.product((-1, 0, 1), repeat=3) if offset >= (0, 0, 0)
+], dtype=np.int64)
+
+
+def _cell_keys(cells, dims):
+    if np.prod(dims.astype(float)) < 2**62:
+        return (cells[:, 0] * dims[1] + cells[:, 1]) * dims[2] + cells[:, 2]
+    # Too many cells for a unique key, hash them. Collisions only add
+    # candidate pairs which are filtered on distance anyway.
+    return (cells[:, 0] * 73856093) ^ (cells[:, 1] * 19349663) ^ (cells[:, 2] * 83492791)
+
+
+def weld_clusters(points, tolerance):
+    """
+    Return cluster label per point, points closer than `tolerance` share
+    a label.
+
+    Points are bucketed in a hash grid with cell size `tolerance` so only
+    neighbouring cells are compared, O(n) expected time. Clusters are
+    chained, and labeled with the lowest point index in the cluster.
+    """
+    if not tolerance > 0:
+        raise ValueError('Weld tolerance must be above zero, got {}.'.format(tolerance))
+    points = np.asarray(points, dtype=float).reshape(-1, 3)
+    if not len(points):
+        return np.zeros(0, dtype=int)
+
+    # Pad by one cell so neighbour offsets never go negative.
+    cells = np.floor((points - points.min(axis=0)) / tolerance).astype(np.int64) + 1
+    dims = cells.max(axis=0) + 2
+    keys = _cell_keys(cells, dims)
+
+    order = np.argsort(keys, kind='mergesort')
+    unique, starts, counts = np.unique(keys[order], return_index=True, return_counts=True)
+    unique_cells = cells[order[starts]]
+
+    first, second = [], []
+    for offset in _HALF_OFFSETS:
+        neighbours = _cell_keys(unique_cells + offset, dims)
+        found = np.searchsorted(unique, neighbours)
+        valid = found < len(unique)
+        valid[valid] = unique[found[valid]] == neighbours[valid]
+        cell_a, cell_b = np.flatnonzero(valid), found[valid]
+
+        # All point pairs between the two cells.
+        size_a, size_b = counts[cell_a], counts[cell_b]
+        total = size_a * size_b
+        pair = np.repeat(np.arange(len(cell_a)), total)
+        step = np.arange(total.sum()) - np.repeat(np.cumsum(total) - total, total)
+        a = order[starts[cell_a][pair] + step // size_b[pair]]
+        b = order[starts[cell_b][pair] + step % size_b[pair]]
+        if not offset.any():
+            keep = a < b
+            a, b = a[keep], b[keep]
+
+        close = np.sum((points[a] - points[b])**2, axis=1) <= tolerance**2
+        first.append(a[close])
+        second.append(b[close])
+
+    return topology.connected_labels(len(points), np.concatenate(first), np.concatenate(second))
+
+
+def merge_distance(points, tolerance):
+    """
+    Return distance for merging points that were moved onto each other.
+
+    Maya stores points as float32 so coincident points can still be a few
+    ulp apart. The distance covers that at the scale of `points` but is
+    capped at half of `tolerance`, so it never merges more than asked for.
+    """
+    points = np.asarray(points, dtype=float)
+    scale = np.abs(points).max() if points.size else 0.0
+    return min(tolerance * 0.5, 8 * float(np.spacing(np.float32(max(scale, 1.0)))))
+
+
+def weld_labels(points, tolerance):
+    """
+    Return cluster labels numbered from 0, cluster centers and the merge
+    distance for welding `points`.
+
+    Clusters are found with :func:`weld_clusters`. Maya merges anything
+    within the merge distance, so centers that close, single points
+    included, are joined and the clusters match what gets merged.
+    """
+    distance = merge_distance(points, tolerance)
+    labels = weld_clusters(points, tolerance)
+    while True:
+        _, labels = np.unique(labels, return_inverse=True)
+        labels = labels.ravel()
+        centers = group_means(points, labels)
+        joined = weld_clusters(centers, distance)
+        if len(np.unique(joined)) == len(centers):
+            return labels, centers, distance
+        labels = joined[labels]
+
+
+def cluster_counts(labels):
+    """
+    Return number of clusters with more than one point and number of
+    points removed when welding them.
+    """
+    _, sizes = np.unique(labels, return_counts=True)
+    return int(np.sum(sizes > 1)), int(np.sum(sizes - 1))
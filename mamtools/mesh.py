@@ -5,25 +5,33 @@ import math
 import logging
 import collections
 
+import numpy as np
+
 from maya import cmds
 from maya.api.OpenMaya import MFn
 import maya.api.OpenMaya as api
 
 import mampy
 from mampy.utils import undoable, repeatable, get_outliner_index
-from mampy.core.datatypes import BoundingBox
 from mampy.core.dagnodes import Node
-from mampy.core.components import MeshPolygon, MeshVert, get_vert_order_from_connected_edges
+from mampy.core.components import MeshVert
 from mampy.core.selectionlist import ComponentList
 from mampy.core.exceptions import InvalidSelection, ObjecetDoesNotExist
 from mampy.core.utils import get_average_vert_normal
 
+from mamtools import geometry, meshdata, topology
+
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
 
 EPS = sys.float_info.epsilon
 
+try:
+    string_types = basestring
+except NameError:
+    string_types = str
+
 
 @undoable()
 @repeatable
@@ -39,28 +47,20 @@ def detach(extract=False):
         if control.type not in [MFn.kMeshPolygonComponent, MFn.kMeshEdgeComponent]:
             raise InvalidSelection('Detach only works on edges and polygons.')
 
-    new = ComponentList()
+    new = []
     for comp in selected:
+        if not comp.type == MFn.kMeshPolygonComponent:
+            comp = comp.to_face()
 
         node = Node(comp.dagpath)
         name = '{}_{}'.format(node.transform.short_name, 'ext' if extract else 'dup')
-        cmds.duplicate(str(comp.dagpath), n=name)
-
-        # Delete unwanted children from duplicate hierarchy
-        dupdag = Node(name)
-        for child in dupdag.iterchildren():
-            if child.type == MFn.kTransform:
-                cmds.delete(str(child))
+        new.append(meshdata.extract_faces(comp.dagpath, list(comp.indices), name))
 
         if extract:
             cmds.polyDelFacet(comp.cmdslist())
 
-        dupcomp = MeshPolygon.create(dupdag.dagpath).add(comp.indices)
-        cmds.polyDelFacet(dupcomp.toggle().cmdslist())
-
-        cmds.hilite(str(dupdag))
-        new.append(dupcomp.get_complete())
-    cmds.select(new.cmdslist(), r=True)
+    cmds.hilite(new)
+    cmds.select(['{}.f[*]'.format(dag) for dag in new], r=True)
 
 
 @undoable()
@@ -75,7 +75,7 @@ def combine_separate():
     """
     def clean_up_object(new):
         """
-        Cleans up after `polyUnite` / `polySeparate`
+        Cleans up after `polyUnite` / shell separation
         """
         if not new.get_parent() == parent:
             new.set_parent(parent)
@@ -106,6 +106,12 @@ def combine_separate():
             elif dag.is_parent_of(each):
                 continue
             each.set_parent(each)
+    else:
+        # Label shells up front, there is nothing to separate on one shell.
+        _, counts, connects = meshdata.get_mesh_arrays(name)
+        shells = topology.label_shells(counts, connects)
+        if not shells.max() > 0:
+            raise InvalidSelection('{} only has one shell.'.format(name))
 
     outliner_index = get_outliner_index(dag)
     dag.transform.attr['rotate'] = (0, 0, 0)
@@ -116,7 +122,7 @@ def combine_separate():
         cmds.select(clean_up_object(new_dag), r=True)
     else:
         logger.debug('Separate Objects.')
-        new_dags = mampy.daglist(cmds.polySeparate(name, ch=False))
+        new_dags = mampy.daglist(meshdata.separate_shells(name, shells))
         for new in new_dags:
             cmds.rename(clean_up_object(new), name.split('|')[-1])
         cmds.delete(name)
@@ -125,9 +131,12 @@ def combine_separate():
 
 @undoable()
 @repeatable
-def flatten(averaged=True):
+def flatten(averaged=True, fit=None):
     """
     Flattens selection by averaged normal.
+
+    Give `fit` as 'normal' or 'pca' to project points on a fitted plane
+    directly instead of going through the scale manipulator.
     """
     def flatten(component, script_job=False):
 
@@ -151,6 +160,9 @@ def flatten(averaged=True):
         """
         flatten(next(iter(mampy.complist())).to_vert(), True)
 
+    if fit is not None:
+        return flatten_to_plane(fit)
+
     selected = mampy.complist()
     if averaged:
         for comp in selected:
@@ -161,6 +173,28 @@ def flatten(averaged=True):
         cmds.scriptJob(event=['SelectionChanged', script_job], runOnce=True)
 
 
+def flatten_to_plane(fit='normal'):
+    """
+    Project selected verts onto a plane fitted per object.
+
+    The plane follows the averaged vertex normal with 'normal' or a least
+    squares fit with 'pca'. Selection and manipulators are left alone.
+    """
+    if fit not in ('normal', 'pca'):
+        raise ValueError('Invalid plane fit: {}'.format(fit))
+
+    writer = meshdata.PointWriter()
+    for component, indices, points in get_selected_vert_points():
+        normals = None
+        if fit == 'normal':
+            normals = geometry.to_array(
+                component.mesh.getVertexNormals(False, api.MSpace.kWorld), indices
+            )
+        center, normal = geometry.fit_plane(points, normals)
+        writer.set(component.dagpath, indices, geometry.project_to_plane(points, center, normal))
+    writer.commit()
+
+
 @undoable()
 @repeatable
 def spin_edge(offset=1):
@@ -178,48 +212,35 @@ def spin_edge(offset=1):
 
 
 @undoable()
-def draw_circle():
+def draw_circle(nearest=False):
+    """
+    Shape selected border loops into circles.
+
+    Verts are placed on the circle by angle around the loop normal, use
+    `nearest` to place each vert on the closest free circle point instead.
+    """
+
+    def get_points(indices):
+        return fetched[np.searchsorted(needed, indices)]
 
     def dpsum():
-        verts = collections.deque(ordered_verts)
-        plane_euler = api.MEulerRotation(plane_unit_vector).asMatrix()
-        greatest_sum = 0
-        for x in xrange(len(verts)):
-            verts.append(verts[0])
-
-            dpsum = 0
-            theta = (math.pi*2) / (len(verts)-1)
-            for idx, vert in enumerate(verts):
-                angle = theta*idx
-                point = vert.bbox.center
-                angle_matrix = api.MMatrix((
-                    [math.cos(angle), -math.sin(angle), 0, 0],
-                    [math.sin(angle), math.cos(angle), 0, 0],
-                    [0, 0, 1, 0],
-                    [0, 0, 0, 1],
-                ))
-                rotate_vector = angle_matrix * api.MVector(point * plane_euler)
-                dpsum += api.MVector(point) * rotate_vector
-
-            if dpsum > greatest_sum:
-                greatest_sum, first = dpsum, verts[0]
-            verts.pop()
-            verts.rotate(1)
-        return first.indices[0]
+        position = geometry.find_start_vertex(get_points(ordered_vert_indices), list(plane_unit_vector))
+        return ordered_vert_indices[position]
 
     def get_control_vert():
         for vert in selected:
             # make sure vert belongs to same dagpath object and is vert
-            if not vert.is_vert() or not vert.dagpath == comp.dagpath:
+            if not vert.is_vert() or not vert.dagpath == component.dagpath:
                 continue
 
             for index in vert.indices:
-                if index in comp.vertices:
+                if index in ordered_vert_indices:
                     return index
         # If we can't find a control vert try to determine the vert.
         # This is very unreliable but better than skewed results.
         return dpsum()
 
+    writer = meshdata.PointWriter()
     selected = mampy.multicomplist()
     for component in selected:
         # Verts are used to specify first vert in row. Exit out if we encounter
@@ -227,15 +248,38 @@ def draw_circle():
         if component.is_vert():
             continue
 
-        for comp in component.get_connected_components():
+        # Border loops of connected faces or the selected edges themselves,
+        # read from cached topology.
+        mesh_topology = meshdata.get_topology(component.dagpath)
+        if component.type == MFn.kMeshPolygonComponent:
+            faces, groups = mesh_topology.face_groups(list(component.indices))
+            edge_groups, edges, shared = mesh_topology.group_edges(faces, groups)
+            loops = [
+                (mesh_topology.edge_vertices[edges[(edge_groups == group) & (shared == 1)]],
+                 np.unique(topology.gather(mesh_topology.face_offsets, mesh_topology.connects,
+                                           faces[groups == group])[1]))
+                for group in range(groups.max() + 1)
+            ]
+        else:
+            pairs = mesh_topology.edge_vertices[np.array(list(component.indices), dtype=int)]
+            loops = [(pairs, None)]
 
-            # Only work on border edges
-            edge = comp.to_edge(border=True)
+        loops = [(ordered_vert_indices, comp_vertices)
+                 for pairs, comp_vertices in loops
+                 for ordered_vert_indices, _ in topology.order_loops(pairs)]
+        if not loops:
+            continue
 
+        # Only read points of the loops and their faces.
+        needed = np.unique(np.concatenate(
+            [verts for verts, _ in loops] + [verts for _, verts in loops if verts is not None]
+        ))
+        fetched = writer.get_points(component.dagpath, needed)
+
+        for ordered_vert_indices, comp_vertices in loops:
             # Order the vert list to make sure we operate in order.
-            ordered_vert_indices = get_vert_order_from_connected_edges(edge.vertices.values())
-            vert_object = MeshVert.create(comp.dagpath).add(ordered_vert_indices)
-            ordered_verts = [vert_object.new().add(i) for i in ordered_vert_indices]
+            ordered_vert_indices = ordered_vert_indices.tolist()
+            vert_object = MeshVert.create(component.dagpath).add(ordered_vert_indices)
             # Get plane unit vector from selection.
             plane_vector = get_average_vert_normal(vert_object.normals, vert_object.indices)
             plane_unit_vector = plane_vector.normalize()
@@ -243,48 +287,36 @@ def draw_circle():
             # Cant use the components bounding box here as the bounding box is not
             # rotated to fit the component. The only valid way to get center is
             # average the selected points.
-            center = api.MPoint()
-            for i in comp.points:
-                center += i
-            center /= len(comp.points)
+            used = ordered_vert_indices if comp_vertices is None else comp_vertices
+            center = get_points(used).mean(axis=0)
 
             # iterate over the selection and try to find the selected control point.
             control_vert_index = get_control_vert()
             # place vert at beginning of list.
             index_of_control_vert = ordered_vert_indices.index(control_vert_index)
-            ordered_verts = collections.deque(ordered_verts)
+            ordered_verts = collections.deque(ordered_vert_indices)
             ordered_verts.rotate(index_of_control_vert)
+            ordered_verts = list(ordered_verts)
 
             # make circle
-            radius = sum([center.distanceTo(i.bbox.center) for i in ordered_verts])
-            radius /= len(ordered_verts)
+            positions = get_points(ordered_verts)
+            radius = np.linalg.norm(positions - center, axis=1).mean()
 
-            r1 = api.MFloatVector(comp.points[control_vert_index] - center)
+            r1 = api.MFloatVector(*(get_points(control_vert_index) - center))
             r = (r1 ^ plane_unit_vector).normalize()
             s = (r ^ plane_unit_vector).normalize()
 
-            # Create circle and place points in a list, verts might actually not
-            # represent the correct translation yet.
-            points = []
-            theta = (math.pi*2) / len(ordered_verts)
-            for i, p in enumerate(ordered_verts):
-                angle = theta*i
-                x = center.x + radius * (math.sin(angle)*r.x + math.cos(angle)*s.x)
-                y = center.y + radius * (math.sin(angle)*r.y + math.cos(angle)*s.y)
-                z = center.z + radius * (math.sin(angle)*r.z + math.cos(angle)*s.z)
-
-                points.append(api.MPoint(x, y, z))
+            # Create circle points, verts might actually not represent the
+            # correct translation yet.
+            circle = geometry.circle_points(center, radius, list(r), list(s), len(ordered_verts))
 
-            # Finally move the points, find the closest vert to result and move
-            # that vert there.
-            for v in ordered_verts:
-                point = v.bbox.center
-
-                d = {point.distanceTo(p): p for p in points}
-                result = d[min(d.iterkeys())]
-
-                v.translate(translation=list(result)[:3], ws=True, absolute=True)
-                points.remove(result)
+            # Finally move the points, assign each vert a point on the circle
+            # and move that vert there.
+            assigned = geometry.assign_to_circle(
+                positions, circle, center, list(plane_unit_vector), nearest
+            )
+            writer.set(component.dagpath, ordered_verts, circle[assigned])
+    writer.commit()
 
 
 _face_weighted_name = 'face_weighted'
@@ -333,33 +365,62 @@ def display_face_weighted_normals_sets():
     cmds.select(get_face_weighted_sets().cmdslist())
 
 
-def set_face_weighted_normals():
+def set_face_weighted_normals(area=True, angle=False):
     """
+    Set vertex normals on face weighted sets, weighted by face area and
+    optionally by corner angle.
     """
     to_weight = get_face_weighted_sets()
     if not to_weight:
         raise ObjecetDoesNotExist()
 
     for each in to_weight:
-        for connected in each.get_connected_components():
-            shared_vert_map = collections.defaultdict(list)
-
-            for idx in connected.indices:
-                for vert_index in each.vertices[idx]:
-                    shared_vert_map[vert_index].append(idx)
+        points, counts, connects = meshdata.get_mesh_arrays(each.mesh)
+        vertices, normals = geometry.vertex_normals(
+            points, counts, connects, list(each.indices), area=area, angle=angle,
+        )
+        meshdata.set_vertex_normals(each.mesh, vertices, normals)
 
-            for vert, shared in shared_vert_map.iteritems():
-                averaged = get_average_vert_normal(each.normals, shared)
-                each.mesh.setVertexNormal(averaged, vert)
 
+def get_selected_vert_points():
+    """
+    Return list of (component, indices, world points) for selected verts.
 
-def set_vertex_normals_on_selected_from_vector(vector):
+    Only the selected points are read, once per mesh.
+    """
+    selected, backend = [], meshdata.MayaMeshBackend()
     for component in mampy.complist():
         if not component.is_vert():
             component = component.to_vert()
-        for index in component:
-            normal = (component.points[index] - vector).normalize()
-            component.mesh.setVertexNormal(normal, index, space=api.MSpace.kWorld)
+        indices = np.array(list(component.indices), dtype=int)
+        selected.append((component, indices, backend.get_points(component.dagpath, indices)))
+    return selected
+
+
+def get_pivot_position(pivot):
+    """
+    Return world position of pivot.
+
+    Pivot can be a point, a node name or 'manipulator' for the current
+    move manipulator position.
+    """
+    if isinstance(pivot, string_types):
+        if pivot == 'manipulator':
+            return cmds.manipMoveContext('Move', q=True, position=True)
+        return cmds.xform(pivot, q=True, ws=True, rotatePivot=True)
+    if isinstance(pivot, (api.MPoint, api.MVector, api.MFloatPoint, api.MFloatVector)):
+        return [pivot.x, pivot.y, pivot.z]
+    return list(pivot)[:3]
+
+
+def set_vertex_normals_on_selected_from_vector(vector, selected=None):
+    """
+    Point normals of selected verts away from given position.
+    """
+    position = get_pivot_position(vector)
+    for component, indices, points in selected or get_selected_vert_points():
+        normals = geometry.radial_normals(points, position)
+        meshdata.set_vertex_normals(component.mesh, indices, normals, api.MSpace.kWorld)
 
 
 def vertex_normals_from_origo():
@@ -367,12 +428,18 @@ def vertex_normals_from_origo():
 
 
 def vertex_normals_from_selection_center():
-    bbox = BoundingBox()
-    for component in mampy.complist():
-        if not component.is_vert():
-            component = component.to_vert()
-        bbox.expand(component.bbox)
-    set_vertex_normals_on_selected_from_vector(bbox.center)
+    selected = get_selected_vert_points()
+    if not selected:
+        return logger.warn('Nothing selected.')
+    center = geometry.bounding_box_center(np.vstack([p for _, _, p in selected]))
+    set_vertex_normals_on_selected_from_vector(center.tolist(), selected)
+
+
+def vertex_normals_from_pivot(pivot='manipulator'):
+    """
+    Point normals away from a locator, node or the manipulator position.
+    """
+    set_vertex_normals_on_selected_from_vector(pivot)
 
 
 if __name__ == '__main__':
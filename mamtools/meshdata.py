@@ -0,0 +1,747 @@
+"""
+Mesh Data
+
+Bulk access to mesh point data. Tools collect new positions in a
+:class:`PointWriter` and the writer commits them with one call per mesh
+through a backend. :class:`MayaMeshBackend` talks to maya while
+:class:`FakeMeshBackend` keeps meshes in memory so tools and solvers can
+be run without a maya session.
+"""
+import re
+import contextlib
+import collections
+
+import numpy as np
+
+try:
+    from maya import cmds
+    import maya.api.OpenMaya as api
+except ImportError:
+    cmds = api = None
+
+from mamtools import geometry, topology
+
+
+def get_mesh_name(mesh):
+    """
+    Return name used to key given mesh, accepts names or dagpaths.
+    """
+    if hasattr(mesh, 'fullPathName'):
+        return mesh.fullPathName()
+    return str(mesh)
+
+
+def get_dagpath(mesh):
+    """
+    Return shape dagpath from name or dagpath.
+    """
+    if isinstance(mesh, api.MDagPath):
+        dagpath = api.MDagPath(mesh)
+    else:
+        dagpath = api.MSelectionList().add(str(mesh)).getDagPath(0)
+    return dagpath.extendToShape()
+
+
+def get_mesh_arrays(mesh, space=None):
+    """
+    Return points, face vertex counts and face vertex indices as arrays.
+    """
+    fn = mesh if isinstance(mesh, api.MFnMesh) else api.MFnMesh(get_dagpath(mesh))
+    counts, connects = fn.getVertices()
+    points = geometry.to_array(fn.getPoints(space or api.MSpace.kObject))
+    return points, np.array(counts, dtype=int), np.array(connects, dtype=int)
+
+
+def set_vertex_normals(mesh, vertices, normals, space=None):
+    """
+    Set normals for given vertices with a single ``setVertexNormals`` call.
+    """
+    fn = mesh if isinstance(mesh, api.MFnMesh) else api.MFnMesh(get_dagpath(mesh))
+    fn.setVertexNormals(
+        api.MVectorArray([api.MVector(n) for n in np.asarray(normals).tolist()]),
+        api.MIntArray(np.asarray(vertices).tolist()),
+        space or api.MSpace.kObject,
+    )
+
+
+def get_edge_vertices(mesh):
+    """
+    Return (n, 2) array with the vertex pair of each edge, read with a
+    single ``polyInfo`` query.
+    """
+    ids, pairs, _ = get_edge_data(['{}.e[*]'.format(get_dagpath(mesh).fullPathName())])
+    return pairs[np.argsort(ids)]
+
+
+def _remove_topology_callbacks(key):
+    ids = _topology_callbacks.pop(key, None)
+    if ids:
+        api.MMessage.removeCallbacks(ids)
+
+
+def _add_topology_callbacks(key, dagpath):
+    if not _topology_callbacks:
+        _topology_callbacks[None] = [
+            api.MSceneMessage.addCallback(event, lambda *args: topology_cache.clear())
+            for event in [api.MSceneMessage.kBeforeNew, api.MSceneMessage.kBeforeOpen]
+        ]
+
+    node = dagpath.node()
+    _topology_callbacks[key] = [
+        api.MPolyMessage.addPolyTopologyChangedCallback(
+            node, lambda *args: topology_cache.invalidate(key)),
+        api.MNodeMessage.addNodeDirtyCallback(
+            node, lambda *args: topology_cache.mark_dirty(key)),
+        api.MNodeMessage.addNodePreRemovalCallback(
+            node, lambda *args: topology_cache.evict(key)),
+    ]
+
+
+_topology_callbacks = {}
+topology_cache = topology.TopologyCache(on_evict=_remove_topology_callbacks)
+
+
+def get_topology(mesh):
+    """
+    Return cached :class:`topology.Topology` for mesh.
+
+    Entries are dropped when maya reports a topology change. When the
+    node is dirtied the face-vertex arrays are fingerprinted once to check
+    if the cached topology is still valid.
+    """
+    dagpath = get_dagpath(mesh)
+    key = dagpath.fullPathName()
+    cached = topology_cache.get(key)
+    if cached is not None:
+        return cached
+
+    fn = api.MFnMesh(dagpath)
+    counts, connects = fn.getVertices()
+    counts, connects = np.array(counts, dtype=int), np.array(connects, dtype=int)
+    fingerprint = topology.fingerprint(counts, connects)
+    cached = topology_cache.get(key, fingerprint)
+    if cached is not None:
+        return cached
+
+    result = topology.Topology(counts, connects, lambda: get_edge_vertices(dagpath),
+                               fn.numVertices)
+    topology_cache.put(key, fingerprint, result)
+    if key not in _topology_callbacks:
+        _add_topology_callbacks(key, dagpath)
+    return result
+
+
+def get_mobject(name):
+    return api.MSelectionList().add(str(name)).getDependNode(0)
+
+
+def get_face_shaders(dagpath, faces=None):
+    """
+    Return shading group names and shading group index per face.
+
+    Only `faces` are converted to an array if given.
+    """
+    shaders, face_shaders = api.MFnMesh(dagpath).getConnectedShaders(dagpath.instanceNumber())
+    names = [api.MFnDependencyNode(s).name() for s in shaders]
+    if faces is not None:
+        face_shaders = [face_shaders[face] for face in faces]
+    return names, np.array(face_shaders, dtype=int)
+
+
+def get_face_component(faces):
+    """
+    Return polygon component object holding `faces`.
+    """
+    component = api.MFnSingleIndexedComponent()
+    mobject = component.create(api.MFn.kMeshPolygonComponent)
+    component.addElements(np.asarray(faces, dtype=int).tolist())
+    return mobject
+
+
+def get_vertex_points(mesh, indices=None, space=None):
+    """
+    Return positions of vertex `indices`, or all verts, with one ``xform``.
+    """
+    shape = get_dagpath(mesh).fullPathName()
+    if indices is None:
+        components = ['{}.vtx[*]'.format(shape)]
+    else:
+        indices = np.asarray(indices, dtype=int)
+        components = component_ranges(shape, 'vtx', indices)
+        if not components:
+            return np.zeros((0, 3))
+
+    # xform flattens the ranges in sorted order.
+    flag = 'ws' if space == api.MSpace.kWorld else 'os'
+    points = cmds.xform(components, q=True, t=True, **{flag: True}) or []
+    points = np.array(points, dtype=float).reshape(-1, 3)
+    if indices is None:
+        return points
+    return points[np.searchsorted(np.unique(indices), indices)]
+
+
+def component_ranges(mesh, kind, indices):
+    """
+    Return component names covering `indices` with as few ranges as possible.
+    """
+    indices = np.unique(np.asarray(indices, dtype=int))
+    if not len(indices):
+        return []
+    breaks = np.flatnonzero(np.diff(indices) != 1) + 1
+    return ['{}.{}[{}:{}]'.format(mesh, kind, r[0], r[-1]) for r in np.split(indices, breaks)]
+
+
+def assign_shaders(meshes, shaders):
+    """
+    Assign shading groups to faces, one ``sets`` call per shading group.
+
+    `meshes` is a list of (mesh, face shaders) where face shaders holds an
+    index into `shaders` per face. Faces without a shader (-1) get the
+    initial shading group.
+    """
+    members = collections.OrderedDict()
+    for mesh, face_shaders in meshes:
+        face_shaders = np.asarray(face_shaders, dtype=int)
+        for index in np.unique(face_shaders):
+            shader = shaders[index] if index >= 0 else 'initialShadingGroup'
+            faces = np.flatnonzero(face_shaders == index)
+            if len(faces) == len(face_shaders):
+                members.setdefault(shader, []).append(mesh)
+            else:
+                members.setdefault(shader, []).extend(component_ranges(mesh, 'f', faces))
+
+    for shader, items in members.items():
+        cmds.sets(items, e=True, forceElement=shader)
+
+
+EDGE_INFO = re.compile(r'EDGE\s+(\d+):\s+(\d+)\s+(\d+)[ \t]*(Hard)?')
+
+
+def get_edge_data(components):
+    """
+    Return edge ids, (n, 2) vertex pairs and smooth flags for given edge
+    components with a single ``polyInfo`` call.
+
+    Edges of several meshes can be queried at once, rows come in the order
+    the components are given.
+    """
+    info = cmds.polyInfo(components, edgeToVertex=True) or []
+    found = EDGE_INFO.findall(''.join(info))
+    if not found:
+        return np.zeros(0, dtype=int), np.zeros((0, 2), dtype=int), np.zeros(0, dtype=bool)
+    data = np.array(found)
+    return data[:, 0].astype(int), data[:, 1:3].astype(int), data[:, 3] != 'Hard'
+
+
+def edge_keys(pairs, vertex_count):
+    """
+    Return a key per vertex pair that ignores pair order.
+    """
+    pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+    return pairs.min(axis=1) * vertex_count + pairs.max(axis=1)
+
+
+class FaceData(object):
+    """
+    Face data of a mesh read with bulk calls.
+
+    Holds points, uv sets, color sets, locked normals, creases, edge
+    smoothing and shaders so they can be carried over to new meshes built
+    from some of the faces. Color sets and normals are only read if the
+    mesh has them. Edge data is read for `edges` components or the whole
+    mesh.
+
+    Give `faces` to read only those faces, their vertices and face-vertex
+    data. Faces are then numbered in sorted order and ``points`` holds
+    the positions of ``vertices``.
+    """
+
+    def __init__(self, mesh, space=None, edges=None, faces=None):
+        self.dagpath = get_dagpath(mesh)
+        self.shape = self.dagpath.fullPathName()
+        self.space = space or api.MSpace.kObject
+        fn = api.MFnMesh(self.dagpath)
+        self.vertex_count = fn.numVertices
+        self.current_uv_set = fn.currentUVSetName()
+        self.current_color_set = fn.currentColorSetName()
+        if faces is None:
+            self._read_mesh(fn)
+        else:
+            self._read_faces(fn, np.unique(np.asarray(faces, dtype=int)))
+        self.face_of, _ = topology.face_vertex_arrays(self.counts)
+
+        try:
+            crease_vertices, vertex_values = fn.getCreaseVertices()
+            crease_edges, edge_values = fn.getCreaseEdges()
+        except RuntimeError:
+            crease_vertices = vertex_values = crease_edges = edge_values = []
+        self.vertex_creases = (np.array(crease_vertices, dtype=int), np.array(vertex_values))
+
+        ids, pairs, smooth = get_edge_data(edges or ['{}.e[*]'.format(self.shape)])
+        crease = np.zeros(len(ids))
+        if len(crease_edges) and len(ids):
+            order = np.argsort(ids)
+            crease_edges = np.array(crease_edges, dtype=int)
+            pos = np.minimum(np.searchsorted(ids[order], crease_edges), len(ids) - 1)
+            found = ids[order][pos] == crease_edges
+            crease[order[pos[found]]] = np.array(edge_values)[found]
+
+        keys = edge_keys(pairs, self.vertex_count)
+        order = np.argsort(keys)
+        self.edge_keys, self.edge_smooth, self.edge_crease = keys[order], smooth[order], crease[order]
+
+    def _read_mesh(self, fn):
+        self.points, self.counts, self.connects = get_mesh_arrays(fn, self.space)
+        self.vertices = np.arange(len(self.points))
+        self.shaders, self.face_shaders = get_face_shaders(self.dagpath)
+
+        self.uv_sets = []
+        for name in fn.getUVSetNames():
+            u, v = fn.getUVs(name)
+            uv_counts, uv_ids = fn.getAssignedUVs(name)
+            uv_counts = np.array(uv_counts, dtype=int)
+            self.uv_sets.append((name, np.array(u), np.array(v), uv_counts,
+                                 np.r_[0, np.cumsum(uv_counts)], np.array(uv_ids, dtype=int)))
+
+        self.color_sets = []
+        for name in fn.getColorSetNames():
+            colors = np.array([tuple(c) for c in fn.getFaceVertexColors(name)], dtype=float)
+            self._add_color_set(fn, name, colors)
+
+        # Only locked normals are copied, new meshes compute the rest.
+        self.normals = None
+        frozen = cmds.polyNormalPerVertex('{}.vtx[*]'.format(self.shape), q=True, freezeNormal=True)
+        if frozen and any(frozen):
+            _, normal_ids = fn.getNormalIds()
+            normals = geometry.to_array(fn.getNormals(self.space))
+            self.normals = normals[np.array(normal_ids, dtype=int)]
+            self._set_locked(frozen)
+
+    def _read_faces(self, fn, faces):
+        self.shaders, self.face_shaders = get_face_shaders(self.dagpath, faces)
+        uv_names, color_names = fn.getUVSetNames(), fn.getColorSetNames()
+
+        # Walk the faces once, face-vertex uvs and colors come with them.
+        counts, connects = [], []
+        uvs = [([], [], []) for _ in uv_names]
+        colors = [[] for _ in color_names]
+        polygons = api.MItMeshPolygon(self.dagpath, get_face_component(faces))
+        while not polygons.isDone():
+            face_vertices = polygons.getVertices()
+            counts.append(len(face_vertices))
+            connects.extend(face_vertices)
+            for name, (uv_counts, uv_ids, uv_values) in zip(uv_names, uvs):
+                if not polygons.hasUVs(name):
+                    uv_counts.append(0)
+                    continue
+                uv_counts.append(len(face_vertices))
+                for index in range(len(face_vertices)):
+                    uv_id, u, v = polygons.getUVIndexAndValue(index, name)
+                    uv_ids.append(uv_id)
+                    uv_values.append((u, v))
+            for name, face_colors in zip(color_names, colors):
+                face_colors.extend(tuple(c) for c in polygons.getColors(name))
+            polygons.next()
+
+        self.counts = np.array(counts, dtype=int)
+        self.connects = np.array(connects, dtype=int)
+        self.vertices = np.unique(self.connects)
+        self.points = get_vertex_points(self.dagpath, self.vertices, self.space)
+
+        # Uv ids are compacted to the uvs the faces use.
+        self.uv_sets = []
+        for name, (uv_counts, uv_ids, uv_values) in zip(uv_names, uvs):
+            _, first, uv_ids = np.unique(np.array(uv_ids, dtype=int),
+                                            return_index=True, return_inverse=True)
+            uv_values = np.array(uv_values, dtype=float).reshape(-1, 2)[first]
+            uv_counts = np.array(uv_counts, dtype=int)
+            self.uv_sets.append((name, uv_values[:, 0], uv_values[:, 1], uv_counts,
+                                 np.r_[0, np.cumsum(uv_counts)], uv_ids.ravel()))
+
+        self.color_sets = []
+        for name, face_colors in zip(color_names, colors):
+            self._add_color_set(fn, name, np.array(face_colors, dtype=float))
+
+        self.normals = None
+        frozen = cmds.polyNormalPerVertex(component_ranges(self.shape, 'vtx', self.vertices),
+                                          q=True, freezeNormal=True)
+        if frozen and any(frozen):
+            normals = []
+            polygons.reset()
+            while not polygons.isDone():
+                normals.extend(polygons.getNormals(self.space))
+                polygons.next()
+            self.normals = geometry.to_array(normals)
+            self._set_locked(frozen)
+
+    def _add_color_set(self, fn, name, colors):
+        colors = colors.reshape(-1, 4)
+        self.color_sets.append((name, fn.isColorClamped(name), fn.getColorRepresentation(name),
+                                colors, ~(colors == -1).all(axis=1)))
+
+    def _set_locked(self, frozen):
+        if len(frozen) == len(self.vertices):
+            self.locked = np.array(frozen, dtype=bool)[np.searchsorted(self.vertices, self.connects)]
+        else:
+            self.locked = np.ones(len(self.connects), dtype=bool)
+
+    def face_vertices(self, faces):
+        """
+        Return face-vertex indices of sorted `faces`.
+        """
+        mask = np.zeros(len(self.counts), dtype=bool)
+        mask[faces] = True
+        return np.flatnonzero(mask[self.face_of])
+
+    def apply(self, fn, faces, face_vertices, vertices):
+        """
+        Set uv sets, color sets, locked normals and vertex creases on `fn`.
+
+        `fn` is a mesh built from sorted source `faces`, `face_vertices`
+        are their source face-vertices in order and `vertices` holds the
+        source vertex of each new vertex.
+        """
+        faces = np.asarray(faces, dtype=int)
+        local_faces = np.repeat(np.arange(len(faces)), self.counts[faces]).tolist()
+        local_connects = np.searchsorted(vertices, self.connects[face_vertices])
+
+        default = fn.currentUVSetName()
+        for idx, (name, u, v, uv_counts, uv_offsets, uv_ids) in enumerate(self.uv_sets):
+            if idx == 0 and default:
+                if not name == default:
+                    fn.renameUVSet(default, name)
+            else:
+                fn.createUVSet(name)
+            _, ids = topology.gather(uv_offsets, uv_ids, faces)
+            if not len(ids):
+                continue
+            used, local = np.unique(ids, return_inverse=True)
+            fn.setUVs(api.MFloatArray(u[used].tolist()), api.MFloatArray(v[used].tolist()), name)
+            fn.assignUVs(api.MIntArray(uv_counts[faces].tolist()),
+                         api.MIntArray(local.ravel().tolist()), name)
+        if self.current_uv_set:
+            fn.setCurrentUVSetName(self.current_uv_set)
+
+        for name, clamped, rep, colors, assigned in self.color_sets:
+            fn.createColorSet(name, clamped, rep)
+            fn.setCurrentColorSetName(name)
+            keep = np.flatnonzero(assigned[face_vertices])
+            if len(keep):
+                fn.setFaceVertexColors(
+                    api.MColorArray([api.MColor(c) for c in colors[face_vertices][keep].tolist()]),
+                    api.MIntArray([local_faces[i] for i in keep]),
+                    api.MIntArray(local_connects[keep].tolist()),
+                    rep=rep,
+                )
+        if self.current_color_set:
+            fn.setCurrentColorSetName(self.current_color_set)
+
+        if self.normals is not None:
+            keep = np.flatnonzero(self.locked[face_vertices])
+            if len(keep):
+                fn.setFaceVertexNormals(
+                    api.MVectorArray([api.MVector(n) for n in self.normals[face_vertices][keep].tolist()]),
+                    api.MIntArray([local_faces[i] for i in keep]),
+                    api.MIntArray(local_connects[keep].tolist()),
+                    self.space,
+                )
+
+        crease_vertices, values = self.vertex_creases
+        if len(crease_vertices):
+            pos = np.minimum(np.searchsorted(vertices, crease_vertices), len(vertices) - 1)
+            found = vertices[pos] == crease_vertices
+            if found.any():
+                fn.setCreaseVertices(api.MUintArray(pos[found].tolist()),
+                                     api.MDoubleArray(values[found].tolist()))
+
+    def apply_edges(self, fn, vertices, pairs):
+        """
+        Set edge smoothing and creases on `fn` in one call each.
+
+        `pairs` holds the new vertex pair of every edge on `fn` in edge
+        order, `vertices` the source vertex of each new vertex.
+        """
+        keys = edge_keys(np.asarray(vertices)[pairs], self.vertex_count)
+        smooth = np.ones(len(keys), dtype=bool)
+        crease = np.zeros(len(keys))
+        if len(self.edge_keys):
+            pos = np.minimum(np.searchsorted(self.edge_keys, keys), len(self.edge_keys) - 1)
+            found = self.edge_keys[pos] == keys
+            smooth[found] = self.edge_smooth[pos[found]]
+            crease[found] = self.edge_crease[pos[found]]
+
+        fn.setEdgeSmoothings(api.MIntArray(list(range(len(keys)))), smooth.tolist())
+        fn.cleanupEdgeSmoothing()
+        creased = np.flatnonzero(crease > 0)
+        if len(creased):
+            fn.setCreaseEdges(api.MUintArray(creased.tolist()),
+                              api.MDoubleArray(crease[creased].tolist()))
+        fn.updateSurface()
+
+
+def create_mesh_data(points, counts, connects):
+    """
+    Build mesh data with a single ``MFnMesh.create``.
+
+    The data lives outside the scene so it can be edited freely before
+    :func:`add_mesh` puts it on a shape. Returns data object and the mesh
+    function set editing it.
+    """
+    data = api.MFnMeshData().create()
+    fn = api.MFnMesh()
+    fn.create(api.MPointArray([api.MPoint(p) for p in np.asarray(points).tolist()]),
+              api.MIntArray(np.asarray(counts).tolist()),
+              api.MIntArray(np.asarray(connects).tolist()), parent=data)
+    return data, fn
+
+
+def add_mesh(data, name=None, parent=None):
+    """
+    Create transform and mesh shape holding a copy of mesh `data`.
+
+    Nodes are made with ``createNode`` so undo removes them, the geometry
+    is only written to the new shape. Returns transform long name and the
+    shape function set.
+    """
+    kwargs = {'parent': parent} if parent else {}
+    if name:
+        kwargs['name'] = name
+    transform = cmds.ls(cmds.createNode('transform', **kwargs), long=True)[0]
+    cmds.createNode('mesh', name='{}Shape'.format(transform.split('|')[-1]), parent=transform)
+    fn = api.MFnMesh(get_dagpath(transform))
+    fn.copyInPlace(data)
+    return transform, fn
+
+
+def get_new_edge_pairs(meshes):
+    """
+    Return edge vertex pairs of new meshes in edge order with one query.
+    """
+    fns = [api.MFnMesh(get_dagpath(mesh)) for mesh in meshes]
+    ids, pairs, _ = get_edge_data(['{}.e[*]'.format(fn.fullPathName()) for fn in fns])
+    splits = np.cumsum([fn.numEdges for fn in fns])[:-1]
+    return [p[np.argsort(i)] for i, p in zip(np.split(ids, splits), np.split(pairs, splits))]
+
+
+def extract_faces(mesh, faces, name):
+    """
+    Build a new mesh from `faces` on `mesh` without duplicating it.
+
+    The new mesh gets the points, uv and color sets, locked normals,
+    creases, shaders and edge smoothing of the faces and a transform
+    matching the source. Only the faces, their vertices and face-vertex
+    data are read. Returns transform name.
+    """
+    dagpath = get_dagpath(mesh)
+    faces = np.unique(np.asarray(faces, dtype=int))
+    edges = cmds.polyListComponentConversion(
+        component_ranges(dagpath.fullPathName(), 'f', faces), fromFace=True, toEdge=True
+    )
+    data = FaceData(dagpath, edges=edges, faces=faces)
+    vertices = data.vertices
+
+    source_transform = api.MDagPath(dagpath)
+    source_transform.pop()
+    source_transform = source_transform.fullPathName()
+    parent = cmds.listRelatives(source_transform, parent=True, fullPath=True)
+
+    mesh_data, fn = create_mesh_data(data.points, data.counts, np.searchsorted(vertices, data.connects))
+    data.apply(fn, np.arange(len(faces)), np.arange(len(data.connects)), vertices)
+    transform, fn = add_mesh(mesh_data, name, parent and parent[0])
+    cmds.xform(transform, os=True,
+               matrix=cmds.xform(source_transform, q=True, os=True, matrix=True))
+    for pivot in ['rotatePivot', 'scalePivot']:
+        position = cmds.xform(source_transform, q=True, os=True, **{pivot: True})
+        cmds.xform(transform, os=True, **{pivot: position})
+
+    data.apply_edges(fn, vertices, get_new_edge_pairs([transform])[0])
+    assign_shaders([(transform, data.face_shaders)], data.shaders)
+    return transform
+
+
+def separate_shells(mesh, shells=None):
+    """
+    Create one mesh per shell of `mesh` with points in world space.
+
+    `shells` is a shell index per face as given by
+    :func:`topology.label_shells` and is computed if not given. Source data
+    is read once and split for all shells, each shell is built as mesh
+    data and put on nodes made by :func:`add_mesh` so undo removes them.
+    Edge data and shaders are set with one query and one ``sets`` call
+    per shading group for all shells. Returns new transforms.
+    """
+    data = FaceData(mesh, api.MSpace.kWorld)
+    if shells is None:
+        shells = topology.label_shells(data.counts, data.connects, len(data.points))
+    shells = np.asarray(shells, dtype=int)
+
+    labels = shells[data.face_of]
+    order = np.argsort(labels, kind='mergesort')
+    face_vertices = np.split(order, np.searchsorted(labels[order], np.arange(1, shells.max() + 1)))
+
+    new, functions = [], []
+    for (vertices, shell_counts, shell_connects, faces), shell_face_vertices in zip(
+            zip(*topology.split_faces(data.counts, data.connects, shells)), face_vertices):
+        mesh_data, fn = create_mesh_data(data.points[vertices], shell_counts, shell_connects)
+        data.apply(fn, faces, shell_face_vertices, vertices)
+        transform, fn = add_mesh(mesh_data)
+        new.append(transform)
+        functions.append((fn, vertices, faces))
+
+    for (fn, vertices, _), pairs in zip(functions, get_new_edge_pairs(new)):
+        data.apply_edges(fn, vertices, pairs)
+    assign_shaders([(transform, data.face_shaders[faces])
+                    for transform, (_, _, faces) in zip(new, functions)], data.shaders)
+    return new
+
+
+class MeshBackend(object):
+    """
+    Interface for reading and writing mesh points in world space.
+    """
+
+    def get_points(self, mesh, indices=None):
+        raise NotImplementedError()
+
+    def set_points(self, mesh, indices, points):
+        raise NotImplementedError()
+
+    @contextlib.contextmanager
+    def transaction(self):
+        yield
+
+
+class MayaMeshBackend(MeshBackend):
+    """
+    Reads points with ``xform`` and writes through the shape tweaks.
+
+    Only the requested vertices are queried, the ``getPoints`` array of a
+    large mesh costs a Python conversion per vertex.
+
+    ``MFnMesh.setPoints`` does not reach the undo queue so points are
+    written as offsets on the ``pnts`` plug, in one ``setAttr`` per mesh.
+    """
+
+    def get_points(self, mesh, indices=None):
+        return get_vertex_points(mesh, indices, api.MSpace.kWorld)
+
+    def set_points(self, mesh, indices, points):
+        dagpath = get_dagpath(mesh)
+        shape = dagpath.fullPathName()
+
+        inverse = np.array(list(dagpath.inclusiveMatrixInverse())).reshape(4, 4)
+        local = np.c_[points, np.ones(len(points))].dot(inverse)[:, :3]
+        current = get_vertex_points(shape, indices)
+
+        lo, hi = int(indices.min()), int(indices.max())
+        tweaks = self._get_tweaks(shape, lo, hi)
+        tweaks[indices - lo] += local - current
+        cmds.setAttr('{}.pnts[{}:{}]'.format(shape, lo, hi), *tweaks.ravel().tolist())
+
+    def _get_tweaks(self, shape, lo, hi):
+        """
+        Return the ``pnts`` offsets of vertices `lo` to `hi`.
+        """
+        values = cmds.getAttr('{}.pnts[{}:{}]'.format(shape, lo, hi)) or []
+        if len(values) == hi - lo + 1:
+            return np.array(values, dtype=float).reshape(-1, 3)
+
+        # Only existing elements came back, place them by logical index.
+        tweaks = np.zeros((hi - lo + 1, 3))
+        if values:
+            logical = np.array(cmds.getAttr('{}.pnts'.format(shape), multiIndices=True), dtype=int)
+            logical = logical[(logical >= lo) & (logical <= hi)]
+            tweaks[logical - lo] = np.array(values, dtype=float).reshape(-1, 3)
+        return tweaks
+
+    @contextlib.contextmanager
+    def transaction(self):
+        cmds.undoInfo(openChunk=True)
+        try:
+            yield
+        finally:
+            cmds.undoInfo(closeChunk=True)
+
+
+class FakeMeshBackend(MeshBackend):
+    """
+    In memory backend, meshes are (n, 3) point arrays keyed by name.
+
+    Counts calls made to it in ``calls``.
+    """
+
+    def __init__(self, meshes=None):
+        self.meshes = {}
+        self.calls = collections.Counter()
+        for name, points in (meshes or {}).items():
+            self.add_mesh(name, points)
+
+    def add_mesh(self, name, points):
+        self.meshes[name] = np.array(points, dtype=float).reshape(-1, 3)
+
+    def get_points(self, mesh, indices=None):
+        self.calls['get_points'] += 1
+        points = self.meshes[get_mesh_name(mesh)]
+        return points.copy() if indices is None else points[indices]
+
+    def set_points(self, mesh, indices, points):
+        self.calls['set_points'] += 1
+        self.meshes[get_mesh_name(mesh)][indices] = points
+
+
+class PointWriter(object):
+    """
+    Collect new world space positions and write them once per mesh.
+
+    Can be used as a context manager, pending points are committed on exit.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend or MayaMeshBackend()
+        self._pending = collections.OrderedDict()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.clear()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def get_points(self, mesh, indices=None):
+        """
+        Return world space points of `mesh`, only vertex `indices` if given.
+        """
+        return self.backend.get_points(mesh, indices)
+
+    def set(self, mesh, indices, points):
+        """
+        Stage `points` for vertex `indices`, a single point is broadcast.
+        """
+        indices = np.atleast_1d(np.asarray(indices, dtype=int))
+        points = np.asarray(points, dtype=float).reshape(-1, 3)
+        if len(points) == 1 and len(indices) > 1:
+            points = np.repeat(points, len(indices), axis=0)
+        self._pending.setdefault(get_mesh_name(mesh), []).append((indices, points))
+
+    def clear(self):
+        self._pending.clear()
+
+    def commit(self):
+        """
+        Write all pending points, one backend call per mesh.
+        """
+        with self.backend.transaction():
+            for mesh, staged in self._pending.items():
+                indices = np.concatenate([i for i, _ in staged])
+                points = np.concatenate([p for _, p in staged])
+
+                # Later writes to the same vertex win.
+                unique, first = np.unique(indices[::-1], return_index=True)
+                points = points[::-1][first]
+                self.backend.set_points(mesh, unique, points)
+        self.clear()
@@ -52,7 +52,7 @@ def match_pivot_to_object():
 
     # set pivot for driven objects
     for each in s.iterdags():
-        print each, type(each)
+        logger.debug('{} {}'.format(each, type(each)))
         trns = each.get_transform().set_pivot(piv)
 
 
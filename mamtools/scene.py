@@ -0,0 +1,156 @@
+"""
+Scene Index
+
+Keeps node type, parent, shapes and visibility for all dag nodes keyed by
+long name. The index is built with three bulk ``ls`` queries and thrown
+away by callbacks as soon as the dag changes, so tools can filter the
+scene by type without walking it node by node.
+"""
+import logging
+import collections
+
+from maya import cmds
+import maya.api.OpenMaya as api
+
+
+logger = logging.getLogger(__name__)
+
+
+class SceneIndex(object):
+    """
+    Index of dag nodes in the scene.
+
+    ``types`` maps long name to node type, ``parents`` maps long name to
+    parent long name or None for assemblies, ``shapes`` holds shape
+    children per transform in outliner order and ``hidden`` holds nodes
+    reported invisible.
+
+    Nodes are keyed by long name as uuids repeat when a file is referenced
+    more than once. Renaming or parenting a dag node changes the long names
+    of everything below it, so instead of updating entries in place any dag
+    node added, removed, renamed or parented marks the index stale and
+    removes the callbacks until it is built again. Tools that only need a
+    few nodes should query those directly.
+    """
+
+    def __init__(self):
+        self.types = {}
+        self.parents = collections.OrderedDict()
+        self.shapes = collections.defaultdict(list)
+        self.hidden = set()
+        self.built = False
+        self._callbacks = []
+
+    def build(self):
+        """
+        Rebuild index from scratch with bulk queries.
+        """
+        listed = cmds.ls(dag=True, long=True, showType=True) or []
+        names, types = listed[::2], listed[1::2]
+        shapes = set(cmds.ls(dag=True, shapes=True, noIntermediate=True, long=True) or [])
+
+        self.types = dict(zip(names, types))
+        # Kept in ls order so assemblies come out in outliner order.
+        self.parents = collections.OrderedDict()
+        self.shapes = collections.defaultdict(list)
+        for name in names:
+            parent = name.rsplit('|', 1)[0] or None
+            self.parents[name] = parent
+            if name in shapes and parent is not None:
+                self.shapes[parent].append(name)
+
+        self.refresh_visibility()
+        self.built = True
+
+    def refresh_visibility(self):
+        self.hidden = set(cmds.ls(dag=True, invisible=True, long=True) or [])
+
+    def install(self):
+        """
+        Register callbacks marking the index stale.
+        """
+        if self._callbacks:
+            return
+        self._callbacks = [
+            api.MDGMessage.addNodeAddedCallback(self._reset, 'dagNode'),
+            api.MDGMessage.addNodeRemovedCallback(self._reset, 'dagNode'),
+            api.MDagMessage.addAllDagChangesCallback(self._reset),
+            api.MNodeMessage.addNameChangedCallback(api.MObject.kNullObj, self._name_changed),
+            api.MSceneMessage.addCallback(api.MSceneMessage.kAfterNew, self._reset),
+            api.MSceneMessage.addCallback(api.MSceneMessage.kAfterOpen, self._reset),
+        ]
+
+    def uninstall(self):
+        if self._callbacks:
+            api.MMessage.removeCallbacks(self._callbacks)
+        self._callbacks = []
+
+    def _reset(self, *args):
+        self.built = False
+        self.uninstall()
+
+    def _name_changed(self, mobject, *args):
+        if mobject.hasFn(api.MFn.kDagNode):
+            self._reset()
+
+    def first_shape(self, name):
+        """
+        Return first shape under node, None for groups.
+        """
+        shapes = self.shapes.get(name)
+        return shapes[0] if shapes else None
+
+    def shape_type(self, name):
+        """
+        Return type of first shape under node or of the node if a shape.
+        """
+        if name in self.parents and self.parents[name] in self.shapes:
+            if name in self.shapes[self.parents[name]]:
+                return self.types.get(name)
+        shape = self.first_shape(name)
+        return self.types.get(shape) if shape else None
+
+    def assemblies(self):
+        """
+        Return assemblies in outliner order.
+        """
+        return [name for name, parent in self.parents.items() if parent is None]
+
+    def find(self, node_type=None, shape_types=None, hidden=None):
+        """
+        Return nodes matching given node type, first shape types and
+        visibility. Use None in `shape_types` to include groups.
+        """
+        result = []
+        for name, current_type in self.types.items():
+            if node_type is not None and not current_type == node_type:
+                continue
+            if shape_types is not None and self.shape_type(name) not in shape_types:
+                continue
+            if hidden is not None and not (name in self.hidden) == hidden:
+                continue
+            result.append(name)
+        return result
+
+
+_index = SceneIndex()
+
+
+def current_index():
+    """
+    Return scene index if it is built and tracking changes, else None.
+    """
+    if _index.built and _index._callbacks:
+        return _index
+    return None
+
+
+def get_index():
+    """
+    Return scene index, built and hooked up on first use and after any
+    dag change.
+    """
+    if not _index.built:
+        _index.build()
+        _index.install()
+    return _index
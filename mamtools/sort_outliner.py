@@ -3,39 +3,193 @@ Outliner Sorting
 
 Sort your outliner with more control than Mayas default methods.
 
-.. todo::
-
-    * make interface to decide ruleset
-    * add options to include different sorting parameters
-    * add functionality for hierarchy/selection sorting.
-
+Siblings are ordered by a :class:`Ruleset` and moved with as few
+reorders as possible, either for assemblies only, the whole hierarchy or
+under the selection.
 """
-
-import operator
+import re
+import bisect
+import logging
 import collections
 
 import maya.cmds as cmds
 
-import mampy
+from mampy.utils import undoable
+
+from mamtools import scene
 
 
 OutlinerItem = collections.namedtuple('OutlinerItem', 'name type')
+Move = collections.namedtuple('Move', 'name offset')
+Snapshot = collections.namedtuple('Snapshot', 'names types shape_types')
 
 
-def get_object_map():
-    s = mampy.daglist(assemblies=True)
-    objects = collections.defaultdict(list)
-    for obj in s.iterdags():
-        shape = obj.get_shape()
+logger = logging.getLogger(__name__)
+
+
+class FenwickTree(object):
+    """
+    Binary indexed tree counting items at positions 0 to size - 1.
+    """
+
+    def __init__(self, size, filled=False):
+        self.size = size
+        self.tree = [0] * (size + 1)
+        if filled:
+            for i in range(1, size + 1):
+                self.tree[i] += 1
+                parent = i + (i & -i)
+                if parent <= size:
+                    self.tree[parent] += self.tree[i]
 
-        # Special cases for a "nicer" sort.
-        if shape is None:
-            objects['group'].append(OutlinerItem(obj.name, obj.typestr))
+    def add(self, index, delta=1):
+        index += 1
+        while index <= self.size:
+            self.tree[index] += delta
+            index += index & -index
+
+    def count(self, end):
+        """Return number of items before position `end`."""
+        total = 0
+        while end > 0:
+            total += self.tree[end]
+            end -= end & -end
+        return total
+
+
+def longest_increasing_subsequence(values):
+    """
+    Return indices of a longest strictly increasing subsequence.
+    """
+    tails, tail_index, previous = [], [], [-1] * len(values)
+    for idx, value in enumerate(values):
+        pos = bisect.bisect_left(tails, value)
+        if pos == len(tails):
+            tails.append(value)
+            tail_index.append(idx)
         else:
-            if 'light' in shape.typestr.lower():
-                objects['light'].append(OutlinerItem(obj.name, shape.typestr))
-            else:
-                objects[shape.typestr].append(OutlinerItem(obj.name, obj.typestr))
+            tails[pos] = value
+            tail_index[pos] = idx
+        previous[idx] = tail_index[pos - 1] if pos else -1
+
+    result = []
+    idx = tail_index[-1] if tail_index else -1
+    while idx >= 0:
+        result.append(idx)
+        idx = previous[idx]
+    return result[::-1]
+
+
+def plan_reorder(current, target):
+    """
+    Return relative moves turning sibling order `current` into `target`.
+
+    Nodes in a longest increasing run of target positions stay in place,
+    the rest are moved in target order to just after their predecessor.
+    Current and destination indices are counted with fenwick trees so
+    planning is O(n log n) and every node moves at most once.
+    """
+    target_index = dict((name, idx) for idx, name in enumerate(target))
+    positions = [target_index[name] for name in current]
+    size = len(current)
+
+    keep_positions = longest_increasing_subsequence(positions)
+    keep_targets = [positions[i] for i in keep_positions]
+    kept = set(keep_positions)
+
+    # Original slots of nodes not yet moved and target slots of moved nodes.
+    remaining = FenwickTree(size, filled=True)
+    moved = FenwickTree(size)
+
+    original_index = dict((name, idx) for idx, name in enumerate(current))
+    moves = []
+    for name in target:
+        i, t = original_index[name], target_index[name]
+        if i in kept:
+            continue
+
+        next_anchor = bisect.bisect_right(keep_positions, i)
+        next_target = keep_targets[next_anchor] if next_anchor < len(kept) else size
+        start = remaining.count(i) + moved.count(next_target)
+
+        remaining.add(i, -1)
+        anchor = bisect.bisect_left(keep_targets, t) - 1
+        end = anchor + 1 + moved.count(t)
+        if anchor >= 0:
+            end += remaining.count(keep_positions[anchor]) - anchor
+        moved.add(t)
+
+        if not start == end:
+            moves.append(Move(name, end - start))
+    return moves
+
+
+def simulate_reorder(siblings, moves):
+    """
+    Return sibling list after applying relative moves, like reorder -r.
+    """
+    siblings = list(siblings)
+    for name, offset in moves:
+        idx = siblings.index(name)
+        siblings.insert(idx + offset, siblings.pop(idx))
+    return siblings
+
+
+def apply_reorder(moves):
+    with undoable():
+        for move in moves:
+            cmds.reorder(move.name, relative=move.offset)
+
+
+def snapshot_assemblies():
+    """
+    Return names, node types and first shape types of all assemblies.
+
+    Read from the scene index when it is live and complete, otherwise
+    gathered with bulk ``ls`` and ``listRelatives`` queries. Shape type is
+    None for groups.
+    """
+    scene_index = scene.current_index()
+    if scene_index is not None:
+        names = scene_index.assemblies()
+        types = [scene_index.types.get(name) for name in names]
+        # Only trust the index when every assembly resolved, the bulk
+        # queries below are always in line.
+        if None not in types:
+            return Snapshot(names, types, [scene_index.shape_type(name) for name in names])
+
+    listed = cmds.ls(assemblies=True, long=True, showType=True) or []
+    names, types = listed[::2], listed[1::2]
+    if not names:
+        return Snapshot([], [], [])
+
+    shapes = cmds.listRelatives(names, shapes=True, noIntermediate=True, fullPath=True) or []
+    first_shapes, listed = {}, []
+    if shapes:
+        listed = cmds.ls(shapes, showType=True, long=True) or []
+    for shape, shape_type in zip(listed[::2], listed[1::2]):
+        first_shapes.setdefault(shape.rsplit('|', 1)[0], shape_type)
+    return Snapshot(names, types, [first_shapes.get(name) for name in names])
+
+
+def classify(name, node_type, shape_type):
+    """
+    Return (category, item) used to sort node.
+    """
+    # Special cases for a "nicer" sort.
+    if shape_type is None:
+        return 'group', OutlinerItem(name, node_type)
+    if 'light' in shape_type.lower():
+        return 'light', OutlinerItem(name, shape_type)
+    return shape_type, OutlinerItem(name, node_type)
+
+
+def get_object_map(snapshot=None):
+    snapshot = snapshot or snapshot_assemblies()
+    objects = collections.defaultdict(list)
+    for name, node_type, shape_type in zip(*snapshot):
+        category, item = classify(name, node_type, shape_type)
+        objects[category].append(item)
     return objects
 
 
@@ -50,14 +204,160 @@ def sort_keys(d, types):
     return d
 
 
-def outliner_sort():
-    t = get_object_map()
-    types = sort_keys(list(t.iterkeys()), ['camera', 'group'])
+def natural_key(name):
+    """
+    Return key comparing digit runs in name as numbers.
+    """
+    parts = re.split(r'(\d+)', name)
+    parts[1::2] = [int(part) for part in parts[1::2]]
+    return parts
+
+
+class Ruleset(object):
+    """
+    Rules deciding the order of siblings.
+
+    Categories in `priority` come first in that order, remaining
+    categories follow in reverse alphabetical order. Inside a category
+    nodes sort by type then short name. With `natural` digit runs in names
+    compare as numbers and `key` is a callable taking an
+    :class:`OutlinerItem` that replaces the name.
+
+    Keys are cached per item and kept between sorts, so repeated sorts
+    with the same ruleset only compute keys for new or renamed nodes. The
+    cache is cleared when it grows past `max_cached` items.
+    """
+
+    def __init__(self, priority=('camera', 'group'), natural=False, key=None,
+                 max_cached=100000):
+        self.priority = list(priority)
+        self.natural = natural
+        self.key = key
+        self.max_cached = max_cached
+        self._keys = {}
+
+    def clear_cache(self):
+        self._keys.clear()
+
+    def item_key(self, item):
+        if item not in self._keys:
+            if len(self._keys) >= self.max_cached:
+                self._keys.clear()
+            if self.key is not None:
+                name = self.key(item)
+            else:
+                name = item.name.rsplit('|', 1)[-1]
+                if self.natural:
+                    name = natural_key(name)
+            self._keys[item] = (item.type, name)
+        return self._keys[item]
+
+    def order(self, objects):
+        """
+        Return names in sorted order from a category to items map.
+        """
+        categories = [c for c in self.priority if c in objects]
+        categories.extend(sorted((c for c in objects if c not in self.priority), reverse=True))
+
+        names = []
+        for category in categories:
+            names.extend(i.name for i in sorted(objects[category], key=self.item_key))
+        return names
 
-    for obj in types:
-        s = sorted(t[obj], key=operator.attrgetter('type', 'name'), reverse=True)
-        for i in s:
-            cmds.reorder(i.name, f=True)
+
+# Used when no ruleset is given, keeps its key cache between sorts.
+default_ruleset = Ruleset()
+
+
+def snapshot_hierarchy(roots=None):
+    """
+    Return children per parent below `roots` or in the whole scene.
+
+    Gathered with bulk ``ls`` queries. Returns an ordered map of parent
+    long name, '' for the world, to (children, shapes, snapshot) where
+    children are all child names in outliner order, shapes the shape
+    children and snapshot holds the rest.
+    """
+    if roots:
+        listed = cmds.ls(roots, dag=True, long=True, showType=True) or []
+    else:
+        listed = cmds.ls(dag=True, long=True, showType=True) or []
+    names, types = listed[::2], listed[1::2]
+    if not names:
+        return collections.OrderedDict()
+
+    shapes = set(cmds.ls(names, shapes=True, long=True) or [])
+    intermediate = set(cmds.ls(names, intermediateObjects=True, long=True) or [])
+    first_shapes = {}
+    for name, node_type in zip(names, types):
+        if name in shapes and name not in intermediate:
+            first_shapes.setdefault(name.rsplit('|', 1)[0], node_type)
+
+    levels = collections.OrderedDict()
+    for name, node_type in zip(names, types):
+        parent = name.rsplit('|', 1)[0]
+        if parent not in levels:
+            levels[parent] = ([], [], Snapshot([], [], []))
+        children, level_shapes, snapshot = levels[parent]
+        children.append(name)
+        if name in shapes:
+            level_shapes.append(name)
+        else:
+            snapshot.names.append(name)
+            snapshot.types.append(node_type)
+            snapshot.shape_types.append(first_shapes.get(name))
+    return levels
+
+
+def plan_sort(current, objects, ruleset, fixed=()):
+    """
+    Return moves ordering siblings `current` by ruleset.
+
+    Names in `fixed` go first in their current order, names missing from
+    `objects` keep their order after sorted names.
+    """
+    target = list(fixed) + ruleset.order(objects)
+    known, present = set(target), set(current)
+    target = [name for name in target if name in present]
+    target.extend(name for name in current if name not in known)
+    return plan_reorder(current, target)
+
+
+def outliner_sort(ruleset=None, selection=False, hierarchy=False):
+    """
+    Sort outliner by ruleset.
+
+    Sorts assemblies by default, children of selected nodes with
+    `selection` and every level below with `hierarchy`. Each level is
+    reordered with a minimal set of moves, all in one undo chunk.
+    """
+    ruleset = ruleset or default_ruleset
+    roots = None
+    if selection:
+        roots = cmds.ls(sl=True, long=True, transforms=True)
+        if not roots:
+            return logger.warn('Nothing selected.')
+
+    moves = []
+    if not roots and not hierarchy:
+        current = cmds.ls(assemblies=True, long=True) or []
+        moves = plan_sort(current, get_object_map(), ruleset)
+    else:
+        # Levels holding the roots themselves are left alone, below them
+        # only direct children are sorted when not sorting recursively.
+        levels = snapshot_hierarchy(roots)
+        if roots:
+            parents = set(roots)
+            if hierarchy:
+                parents.update(*(children for children, _, _ in levels.values()))
+        else:
+            parents = None
+        for parent, (children, shapes, snapshot) in levels.items():
+            if parents is not None and parent not in parents:
+                continue
+            objects = get_object_map(snapshot)
+            moves.extend(plan_sort(children, objects, ruleset, fixed=shapes))
+    apply_reorder(moves)
 
 
 if __name__ == '__main__':
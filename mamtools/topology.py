@@ -0,0 +1,427 @@
+"""
+Mesh Topology
+
+Index arrays describing mesh connectivity. Meshes are given as face
+vertex counts and face vertex indices, the same layout ``MFnMesh``
+returns from ``getVertices``.
+"""
+import zlib
+import collections
+
+import numpy as np
+
+
+def face_vertex_arrays(counts):
+    """
+    Return face index and first face-vertex offset per face-vertex.
+    """
+    counts = np.asarray(counts, dtype=int)
+    offsets = np.r_[0, np.cumsum(counts)[:-1]]
+    faces = np.repeat(np.arange(len(counts)), counts)
+    return faces, offsets[faces]
+
+
+def compact_faces(counts, connects, faces):
+    """
+    Return data for a submesh made of given faces.
+
+    Returns (used, counts, connects) where `used` holds the original index
+    of each index in the new compacted `connects`. Works for uv counts and
+    ids as well as vertices. Faces keep their ascending index order.
+    """
+    counts = np.asarray(counts, dtype=int)
+    connects = np.asarray(connects, dtype=int)
+    faces = np.unique(np.asarray(faces, dtype=int))
+
+    mask = np.zeros(len(counts), dtype=bool)
+    mask[faces] = True
+    face_of, _ = face_vertex_arrays(counts)
+    used, local = np.unique(connects[mask[face_of]], return_inverse=True)
+    return used, counts[faces], local.ravel()
+
+
+def connected_labels(count, a, b):
+    """
+    Label connected components of a graph with union find.
+
+    Graph has `count` nodes joined by edges `a` to `b`. Roots are hooked
+    onto the lower root for all edges at once and paths are compressed by
+    pointer jumping until nothing changes. Each node is labeled with the
+    lowest node index in its component.
+    """
+    parent = np.arange(count)
+    a = np.asarray(a, dtype=int)
+    b = np.asarray(b, dtype=int)
+    while True:
+        ra, rb = parent[a], parent[b]
+        changed = ra != rb
+        if not changed.any():
+            return parent
+        low = np.minimum(ra, rb)[changed]
+        high = np.maximum(ra, rb)[changed]
+        np.minimum.at(parent, high, low)
+
+        while True:
+            jumped = parent[parent]
+            if np.array_equal(jumped, parent):
+                break
+            parent = jumped
+
+
+def label_shells(counts, connects, vertex_count=None):
+    """
+    Return shell index per face, shells are numbered from 0.
+    """
+    counts = np.asarray(counts, dtype=int)
+    connects = np.asarray(connects, dtype=int)
+    if vertex_count is None:
+        vertex_count = connects.max() + 1 if len(connects) else 0
+
+    _, starts = face_vertex_arrays(counts)
+    labels = connected_labels(vertex_count, connects, connects[starts])
+    offsets = np.r_[0, np.cumsum(counts)[:-1]]
+    _, shells = np.unique(labels[connects[offsets]], return_inverse=True)
+    return shells.ravel()
+
+
+def split_faces(counts, connects, labels):
+    """
+    Split mesh data into one compacted submesh per face label.
+
+    Same as calling :func:`compact_faces` for every label but done in one
+    pass. Returns lists of (used, counts, connects, faces) per label.
+    """
+    counts = np.asarray(counts, dtype=int)
+    connects = np.asarray(connects, dtype=int)
+    labels = np.asarray(labels, dtype=int)
+    shell_count = labels.max() + 1 if len(labels) else 0
+    size = connects.max() + 1 if len(connects) else 1
+
+    face_of, _ = face_vertex_arrays(counts)
+    connect_labels = labels[face_of]
+    faces = np.argsort(labels, kind='mergesort')
+    order = np.argsort(connect_labels, kind='mergesort')
+
+    keys = connect_labels.astype(np.int64) * size + connects
+    unique, inverse = np.unique(keys, return_inverse=True)
+    inverse = inverse.ravel()
+    starts = np.searchsorted(unique // size, np.arange(shell_count))
+    local = inverse - starts[connect_labels]
+
+    steps = np.arange(1, shell_count)
+    return (
+        np.split(unique % size, starts[1:]),
+        np.split(counts[faces], np.searchsorted(labels[faces], steps)),
+        np.split(local[order], np.searchsorted(connect_labels[order], steps)),
+        np.split(faces, np.searchsorted(labels[faces], steps)),
+    )
+
+
+def fingerprint(counts, connects):
+    """
+    Return value identifying the topology of given mesh arrays.
+    """
+    connects = np.ascontiguousarray(connects, dtype=np.int32)
+    counts = np.ascontiguousarray(counts, dtype=np.int32)
+    return (len(counts), len(connects),
+            zlib.crc32(counts.tobytes()), zlib.crc32(connects.tobytes()))
+
+
+def gather(offsets, values, rows):
+    """
+    Return (position, value) pairs for given rows of a CSR array.
+
+    Position is the index into `rows` each value was gathered for.
+    """
+    rows = np.asarray(rows, dtype=int)
+    starts, sizes = offsets[rows], offsets[rows + 1] - offsets[rows]
+    owner = np.repeat(np.arange(len(rows)), sizes)
+    index = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+    return owner, values[starts[owner] + index]
+
+
+class Topology(object):
+    """
+    CSR connectivity arrays for a mesh.
+
+    ``vertex_faces[vertex_face_offsets[v]:vertex_face_offsets[v+1]]`` are
+    faces around vertex ``v``, ``face_edges`` lines up with ``connects`` and
+    holds the edge going from each face-vertex to the next.
+
+    Edge arrays are built on first access. Pass `edge_vertices`, or a
+    callable returning them, to keep edge ids in sync with the host
+    application, otherwise edges are numbered in sorted vertex pair order.
+    """
+
+    def __init__(self, counts, connects, edge_vertices=None, vertex_count=None):
+        self.counts = np.asarray(counts, dtype=int)
+        self.connects = np.asarray(connects, dtype=int)
+        if vertex_count is None:
+            vertex_count = self.connects.max() + 1 if len(self.connects) else 0
+        self.vertex_count = vertex_count
+        self.face_offsets = np.r_[0, np.cumsum(self.counts)]
+
+        face_of, _ = face_vertex_arrays(self.counts)
+        order = np.argsort(self.connects, kind='mergesort')
+        self.vertex_faces = face_of[order]
+        self.vertex_face_offsets = np.r_[
+            0, np.cumsum(np.bincount(self.connects, minlength=vertex_count))
+        ]
+
+        self._edge_source = edge_vertices
+        self._edge_vertices = None
+        self._face_edges = None
+
+    @property
+    def nbytes(self):
+        """
+        Bytes held by the arrays, edge arrays not built yet are counted as
+        if they were so caches can budget for them on insert.
+        """
+        size = sum(v.nbytes for v in vars(self).values() if isinstance(v, np.ndarray))
+        if self._face_edges is None:
+            # One edge per face-vertex, and at most as many edges as
+            # face-vertices with a vertex pair each.
+            size += 3 * len(self.connects) * np.dtype(int).itemsize
+        return size
+
+    @property
+    def edge_vertices(self):
+        if self._edge_vertices is None:
+            self._build_edges()
+        return self._edge_vertices
+
+    @property
+    def face_edges(self):
+        if self._face_edges is None:
+            self._build_edges()
+        return self._face_edges
+
+    def _build_edges(self):
+        face_of, starts = face_vertex_arrays(self.counts)
+        local = np.arange(len(self.connects)) - starts
+        following = self.connects[starts + (local + 1) % self.counts[face_of]]
+        low = np.minimum(self.connects, following).astype(np.int64)
+        high = np.maximum(self.connects, following).astype(np.int64)
+        keys = low * self.vertex_count + high
+
+        edges = self._edge_source
+        if callable(edges):
+            edges = edges()
+        if edges is None:
+            unique = np.unique(keys)
+            edges = np.c_[unique // self.vertex_count, unique % self.vertex_count]
+        edges = np.asarray(edges, dtype=int).reshape(-1, 2)
+
+        edge_keys = (edges.min(axis=1).astype(np.int64) * self.vertex_count +
+                     edges.max(axis=1))
+        edge_order = np.argsort(edge_keys)
+        self._edge_vertices = edges
+        self._face_edges = edge_order[np.searchsorted(edge_keys[edge_order], keys)]
+        self._edge_source = None
+
+    def faces_of_vertices(self, vertices):
+        """
+        Return (vertex, face) pairs for faces around given vertices.
+        """
+        vertices = np.asarray(vertices, dtype=int)
+        owner, faces = gather(self.vertex_face_offsets, self.vertex_faces, vertices)
+        return vertices[owner], faces
+
+    def edges_of_faces(self, faces):
+        """
+        Return (face, edge) pairs for edges around given faces.
+        """
+        faces = np.asarray(faces, dtype=int)
+        owner, edges = gather(self.face_offsets, self.face_edges, faces)
+        return faces[owner], edges
+
+    def face_groups(self, faces):
+        """
+        Return group index per face for faces connected through edges.
+        """
+        faces = np.unique(np.asarray(faces, dtype=int))
+        owner, edges = self.edges_of_faces(faces)
+        order = np.argsort(edges, kind='mergesort')
+        local = np.searchsorted(faces, owner[order])
+        shared = edges[order][1:] == edges[order][:-1]
+        labels = connected_labels(len(faces), local[:-1][shared], local[1:][shared])
+        _, groups = np.unique(labels, return_inverse=True)
+        return faces, groups.ravel()
+
+    def group_edges(self, faces, groups):
+        """
+        Return (group, edge, shared) for edges around grouped faces.
+
+        ``shared`` is the number of faces in the group using the edge, one
+        for edges on the group border.
+        """
+        owner, edges = self.edges_of_faces(faces)
+        group_of = np.asarray(groups, dtype=int)[np.searchsorted(faces, owner)]
+        edge_count = np.int64(len(self.edge_vertices))
+        keys, shared = np.unique(group_of * edge_count + edges, return_counts=True)
+        return keys // edge_count, keys % edge_count, shared
+
+    def vertex_edges(self, vertex):
+        """
+        Return edges connected to vertex.
+        """
+        _, faces = self.faces_of_vertices([vertex])
+        _, edges = self.edges_of_faces(faces)
+        edges = np.unique(edges)
+        return edges[(self.edge_vertices[edges] == vertex).any(axis=1)]
+
+    def loop_continuation(self, vertex, edge):
+        """
+        Return edge continuing the edge loop from `edge` through `vertex`.
+
+        That is the edge on `vertex` sharing no face with `edge`, -1 if
+        there is none.
+        """
+        a, b = self.edge_vertices[edge]
+        faces = np.intersect1d(self.faces_of_vertices([a])[1], self.faces_of_vertices([b])[1])
+        _, beside = self.edges_of_faces(faces)
+        edges = np.setdiff1d(self.vertex_edges(vertex), beside)
+        return edges[0] if len(edges) else -1
+
+
+def order_loops(pairs):
+    """
+    Return ordered vertices for each connected chain or loop of edges.
+
+    Chains are walked from one of their ends, loops from their lowest
+    vertex. Returns list of (vertices, closed) tuples.
+    """
+    pairs = np.asarray(pairs, dtype=int).reshape(-1, 2)
+    vertices, local = np.unique(pairs, return_inverse=True)
+    local = local.reshape(-1, 2)
+    labels = connected_labels(len(vertices), local[:, 0], local[:, 1])
+
+    neighbours = [[] for _ in vertices]
+    for a, b in local.tolist():
+        neighbours[a].append(b)
+        neighbours[b].append(a)
+
+    result = []
+    order = np.argsort(labels, kind='mergesort')
+    for members in np.split(order, np.flatnonzero(np.diff(labels[order])) + 1):
+        ends = [m for m in members.tolist() if len(neighbours[m]) == 1]
+        current = ends[0] if ends else members[0]
+        walked, visited = [current], set([current])
+        while True:
+            following = [n for n in neighbours[current] if n not in visited]
+            if not following:
+                break
+            current = following[0]
+            visited.add(current)
+            walked.append(current)
+        result.append((vertices[walked], not ends))
+    return result
+
+
+def most_shared_faces(topology, groups):
+    """
+    Return the face shared by most vertices for each vertex group.
+
+    Faces are counted for all groups in one pass, ties go to the lowest
+    face index. Empty groups get -1.
+    """
+    sizes = [len(g) for g in groups]
+    result = np.full(len(groups), -1, dtype=int)
+    if not sum(sizes):
+        return result
+    vertices = np.concatenate([np.asarray(g, dtype=int) for g in groups])
+    group_of = np.repeat(np.arange(len(groups)), sizes)
+
+    owner, faces = gather(topology.vertex_face_offsets, topology.vertex_faces, vertices)
+    face_count = np.int64(len(topology.counts))
+    keys, counts = np.unique(group_of[owner] * face_count + faces, return_counts=True)
+    key_groups, key_faces = keys // face_count, keys % face_count
+
+    order = np.lexsort((key_faces, -counts, key_groups))
+    first = np.r_[True, key_groups[order][1:] != key_groups[order][:-1]]
+    result[key_groups[order][first]] = key_faces[order][first]
+    return result
+
+
+class TopologyCache(object):
+    """
+    Least recently used store for :class:`Topology` objects.
+
+    Entries are keyed by mesh and checked against a topology fingerprint.
+    Marking an entry dirty forces the fingerprint to be compared on next
+    lookup, invalidating drops it. The cache is limited to `max_mb`
+    megabytes, `on_evict` is called with the key of entries pushed out by
+    the limit or by :meth:`clear`.
+    """
+
+    def __init__(self, max_mb=256, on_evict=None):
+        self.max_bytes = max_mb * 1024 * 1024
+        self.on_evict = on_evict
+        self._items = collections.OrderedDict()
+        self._dirty = set()
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+    @property
+    def nbytes(self):
+        return sum(t.nbytes for _, t in self._items.values())
+
+    def get(self, key, fingerprint=None):
+        """
+        Return cached topology, or None if missing or out of date.
+
+        Dirty entries are only returned when `fingerprint` matches.
+        """
+        if key not in self._items:
+            return None
+
+        cached_fingerprint, topology = self._items[key]
+        if key in self._dirty:
+            if fingerprint is None:
+                return None
+            if not fingerprint == cached_fingerprint:
+                self.invalidate(key)
+                return None
+            self._dirty.discard(key)
+
+        # Move to end to mark as recently used.
+        del self._items[key]
+        self._items[key] = (cached_fingerprint, topology)
+        return topology
+
+    def is_dirty(self, key):
+        return key in self._dirty
+
+    def put(self, key, fingerprint, topology):
+        if key in self._items:
+            del self._items[key]
+        self._dirty.discard(key)
+        self._items[key] = (fingerprint, topology)
+
+        size = self.nbytes
+        while size > self.max_bytes and len(self._items) > 1:
+            oldest = next(iter(self._items))
+            size -= self._items[oldest][1].nbytes
+            self.evict(oldest)
+
+    def mark_dirty(self, key):
+        if key in self._items:
+            self._dirty.add(key)
+
+    def invalidate(self, key):
+        self._items.pop(key, None)
+        self._dirty.discard(key)
+
+    def evict(self, key):
+        self.invalidate(key)
+        if self.on_evict is not None:
+            self.on_evict(key)
+
+    def clear(self):
+        for key in list(self._items):
+            self.evict(key)
@@ -0,0 +1,12 @@
+"""
+Run mamtools modules headless with maya, mampy and PySide stubbed out.
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'benchmarks')]
+
+import stubs  # noqa: E402
+
+stubs.install()
@@ -0,0 +1,78 @@
+import mamtools.display as display
+
+
+class FakeSignal(object):
+
+    def __init__(self):
+        self.slots = []
+
+    def connect(self, slot):
+        self.slots.append(slot)
+
+    def emit(self, *args):
+        for slot in self.slots:
+            slot(*args)
+
+
+class FakeDock(object):
+
+    def __init__(self, title):
+        self.title = title
+        self.alive = True
+        self.properties = {}
+        self.destroyed = FakeSignal()
+
+    def windowTitle(self):
+        return self.title
+
+    def property(self, name):
+        return self.properties.get(name)
+
+    def setProperty(self, name, value):
+        self.properties[name] = value
+
+    def destroy(self):
+        self.alive = False
+        self.destroyed.emit(self)
+
+
+class FakeWindow(object):
+
+    def __init__(self, titles):
+        self.children = [FakeDock(t) for t in titles]
+        self.searches = 0
+
+    def installEventFilter(self, obj):
+        pass
+
+    def findChildren(self, cls):
+        self.searches += 1
+        return [c for c in self.children if c.alive]
+
+
+class FakeShiboken(object):
+
+    @staticmethod
+    def isValid(obj):
+        return obj.alive
+
+
+def test_dock_registry_holds_docks_and_connects_once(monkeypatch):
+    monkeypatch.setattr(display, 'shiboken', FakeShiboken)
+    window = FakeWindow(['Outliner', 'Attribute Editor', 'Other'])
+    registry = display.DockRegistry(window, cycle=['Attribute Editor', 'Outliner'])
+
+    for _ in range(3):
+        docks = registry.docks()
+    assert [t for t, _ in docks] == ['Attribute Editor', 'Outliner']
+    assert all(dock is not None for _, dock in docks)
+    assert window.searches == 1
+
+    registry.set_cycle(['Outliner', 'Attribute Editor'])
+    registry.docks()
+    assert window.searches == 2
+    assert all(len(dock.destroyed.slots) == 1 for dock in window.children[:2])
+
+    window.children[0].destroy()
+    assert [t for t, _ in registry.docks()] == ['Attribute Editor']
+    assert window.searches == 3
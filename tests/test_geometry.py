@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from mamtools import geometry
+
+
+def random_loop(rng, count):
+    angles = np.sort(rng.uniform(0, np.pi * 2, count))
+    radius = rng.uniform(0.5, 2.0, count)
+    return np.c_[np.cos(angles) * radius, rng.normal(0, 0.1, count), np.sin(angles) * radius]
+
+
+def test_find_start_vertex_matches_reference():
+    rng = np.random.RandomState(0)
+    for _ in range(200):
+        points = random_loop(rng, rng.randint(3, 40))
+        plane_vector = rng.normal(size=3)
+        assert (geometry.find_start_vertex(points, plane_vector) ==
+                geometry.find_start_vertex_reference(points, plane_vector))
+
+
+def test_weld_clusters_needs_positive_tolerance():
+    for tolerance in (0, -1.0):
+        with pytest.raises(ValueError):
+            geometry.weld_clusters(np.zeros((2, 3)), tolerance)
+
+
+def test_merge_distance_within_tolerance():
+    points = np.array([[1000.0, 0, 0], [-5.0, 3.0, 2.0]])
+    distance = geometry.merge_distance(points, 1.0)
+    assert distance >= np.spacing(np.float32(1000.0)) * 4
+    assert geometry.merge_distance(points * 5, 0.001) == 0.0005
+
+
+def test_weld_keeps_points_apart_at_large_coordinates():
+    points = np.array([[5000.0, 0, 0], [5000.05, 0, 0], [5000.1, 0, 0.0]])
+    labels, centers, distance = geometry.weld_labels(points, 0.001)
+    assert geometry.cluster_counts(labels) == (0, 0)
+    assert distance < 0.001
+
+    points = np.r_[points, points + 0.0004]
+    labels, centers, _ = geometry.weld_labels(points, 0.001)
+    assert geometry.cluster_counts(labels) == (3, 3)
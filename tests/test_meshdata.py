@@ -0,0 +1,122 @@
+import numpy as np
+
+import fakemaya
+from mamtools import meshdata
+
+
+def make_writer():
+    backend = meshdata.FakeMeshBackend({
+        'a': np.zeros((5, 3)),
+        'b': np.zeros((3, 3)),
+    })
+    return meshdata.PointWriter(backend), backend
+
+
+def test_last_write_wins():
+    writer, backend = make_writer()
+    writer.set('a', [0, 1], [[1, 1, 1], [2, 2, 2]])
+    writer.set('a', [1], [[3, 3, 3]])
+    writer.commit()
+    assert backend.meshes['a'][0].tolist() == [1, 1, 1]
+    assert backend.meshes['a'][1].tolist() == [3, 3, 3]
+    assert backend.meshes['a'][2:].sum() == 0
+
+
+def test_single_point_is_broadcast():
+    writer, backend = make_writer()
+    writer.set('a', [2, 3, 4], [1, 2, 3])
+    writer.commit()
+    assert backend.meshes['a'][2:].tolist() == [[1, 2, 3]] * 3
+
+
+def test_one_set_points_per_mesh():
+    writer, backend = make_writer()
+    with writer:
+        for i in range(5):
+            writer.set('a', i, [i, 0, 0])
+        for i in range(3):
+            writer.set('b', i, [0, i, 0])
+    assert backend.calls['set_points'] == 2
+    assert not len(writer)
+    assert backend.meshes['b'][:, 1].tolist() == [0, 1, 2]
+
+
+def test_exception_discards_pending():
+    writer, backend = make_writer()
+    try:
+        with writer:
+            writer.set('a', 0, [1, 1, 1])
+            raise RuntimeError()
+    except RuntimeError:
+        pass
+    assert backend.calls['set_points'] == 0
+    assert backend.meshes['a'].sum() == 0
+
+
+def fake_maya(monkeypatch):
+    cmds = fakemaya.FakeCmds(fakemaya.FakeScene())
+    monkeypatch.setattr(meshdata, 'cmds', cmds.module())
+    monkeypatch.setattr(meshdata, 'api', fakemaya.make_openmaya(cmds))
+    return cmds
+
+
+def add_grid(scene, side):
+    corner = (np.arange(side - 1)[:, None] * side + np.arange(side - 1)).ravel()
+    connects = np.c_[corner, corner + 1, corner + side + 1, corner + side].ravel()
+    points = np.c_[np.arange(side * side) % side, np.zeros(side * side), np.arange(side * side) // side]
+    return scene.add_mesh('grid', points, np.full(len(corner), 4), connects).path
+
+
+def test_maya_backend_reads_staged_range(monkeypatch):
+    cmds = fake_maya(monkeypatch)
+    points = np.arange(30, dtype=float).reshape(10, 3)
+    mesh = cmds.scene.add_mesh('grid', points, [], []).path
+    shape = cmds.scene.get('gridShape').mesh
+    shape.tweaks[0] = (1.0, 1.0, 1.0)
+
+    backend = meshdata.MayaMeshBackend()
+    assert backend.get_points(mesh, [6, 2]).tolist() == [points[6].tolist(), points[2].tolist()]
+    backend.set_points(mesh, np.array([3, 5]), np.zeros((2, 3)))
+    assert cmds.calls['getAttr'] == 1
+    assert sorted(shape.tweaks) == [0, 3, 4, 5]
+    assert shape.final_points()[[3, 5]].tolist() == [[0, 0, 0]] * 2
+    assert shape.final_points()[[0, 4]].tolist() == [[1, 2, 3], points[4].tolist()]
+
+
+def test_extract_faces_reads_faces_and_creates_nodes_with_cmds(monkeypatch):
+    cmds = fake_maya(monkeypatch)
+    mesh = add_grid(cmds.scene, 5)
+    before = list(cmds.scene.nodes())
+
+    def full_read(*args):
+        raise AssertionError('Whole mesh was read.')
+    monkeypatch.setattr(meshdata.api.MFnMesh, 'getPoints', full_read)
+    monkeypatch.setattr(meshdata.api.MFnMesh, 'getVertices', full_read)
+
+    transform = meshdata.extract_faces(mesh, [6, 0, 5], 'grid_dup')
+    new = [n for n in cmds.scene.nodes() if n not in before]
+    # Undo only removes nodes made by commands.
+    assert [n.path for n in new] == [transform, transform + '|grid_dupShape']
+    assert all(n in cmds.created for n in new)
+
+    result = cmds.scene.get(transform + '|grid_dupShape').mesh
+    assert result.counts.tolist() == [4, 4, 4]
+    assert result.connects.tolist() == [0, 1, 3, 2, 3, 4, 7, 6, 4, 5, 8, 7]
+    assert result.points[[0, 8]].tolist() == [[0, 0, 0], [3, 0, 2]]
+    assert result.uvs['map1'][2].tolist() == result.connects.tolist()
+
+
+def test_separate_shells_creates_nodes_with_cmds(monkeypatch):
+    cmds = fake_maya(monkeypatch)
+    points = np.c_[np.arange(8) % 4, np.zeros(8), np.arange(8) // 4]
+    mesh = cmds.scene.add_mesh('pair', points, [4, 4], [0, 1, 5, 4, 2, 3, 7, 6]).path
+    before = list(cmds.scene.nodes())
+
+    transforms = meshdata.separate_shells(mesh)
+    new = [n for n in cmds.scene.nodes() if n not in before]
+    assert len(transforms) == 2 and len(new) == 4
+    assert all(n in cmds.created for n in new)
+
+    shells = [cmds.scene.get(t).children[0].mesh for t in transforms]
+    assert [m.connects.tolist() for m in shells] == [[0, 1, 3, 2]] * 2
+    assert shells[1].points[0].tolist() == [2, 0, 0]
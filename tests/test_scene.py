@@ -0,0 +1,54 @@
+import fakemaya
+
+from mamtools import scene
+
+
+def fake_index(monkeypatch):
+    cmds = fakemaya.FakeCmds(fakemaya.FakeScene())
+    monkeypatch.setattr(scene, 'cmds', cmds.module())
+    monkeypatch.setattr(scene, 'api', fakemaya.make_openmaya(cmds))
+    monkeypatch.setattr(scene, '_index', scene.SceneIndex())
+    return cmds
+
+
+def test_index_keeps_nodes_sharing_uuid(monkeypatch):
+    fake_scene = fake_index(monkeypatch).scene
+    # Same file referenced twice gives nodes the same uuids.
+    first = fake_scene.create('ref1:group')
+    second = fake_scene.create('ref2:group')
+    second.uuid = first.uuid
+    fake_scene.create('ref1:groupShape', 'mesh', first)
+    fake_scene.create('ref2:groupShape', 'mesh', second)
+
+    scene_index = scene.get_index()
+    assert sorted(scene_index.assemblies()) == ['|ref1:group', '|ref2:group']
+    assert scene_index.first_shape('|ref2:group') == '|ref2:group|ref2:groupShape'
+    assert len(scene_index.find('transform', shape_types=('mesh',))) == 2
+
+
+def test_reset_removes_callbacks_until_rebuilt(monkeypatch):
+    fake_index(monkeypatch)
+    scene_index = scene.get_index()
+    assert scene.current_index() is scene_index and scene_index._callbacks
+
+    scene_index._reset()
+    assert scene.current_index() is None
+    assert not scene_index._callbacks and not scene_index.built
+
+    assert scene.get_index() is scene_index
+    assert scene_index.built and scene_index._callbacks
+
+
+def test_build_queries_and_dag_renames(monkeypatch):
+    cmds = fake_index(monkeypatch)
+    group = cmds.scene.create('group')
+    cmds.scene.create('groupShape', 'mesh', group)
+    scene_index = scene.get_index()
+    assert cmds.calls['ls'] == 3
+    assert scene_index.types['|group|groupShape'] == 'mesh'
+
+    api = scene.api
+    scene_index._name_changed(api.MObject(fakemaya.Node('material', 'lambert')))
+    assert scene.current_index() is scene_index
+    scene_index._name_changed(api.MObject(group))
+    assert scene.current_index() is None
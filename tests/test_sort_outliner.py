@@ -0,0 +1,66 @@
+import random
+
+import fakemaya
+
+import mamtools.sort_outliner as sort_outliner
+from mamtools import scene
+
+
+def test_plan_reorder_matches_simulation():
+    rng = random.Random(0)
+    for _ in range(300):
+        current = ['node{}'.format(i) for i in range(rng.randint(0, 40))]
+        target = list(current)
+        rng.shuffle(target)
+        moves = sort_outliner.plan_reorder(current, target)
+        assert sort_outliner.simulate_reorder(current, moves) == target
+
+
+def test_plan_reorder_moves_only_out_of_place_nodes():
+    rng = random.Random(1)
+    for _ in range(100):
+        current = ['node{}'.format(i) for i in range(rng.randint(1, 40))]
+        target = list(current)
+        target.insert(rng.randrange(len(target)), target.pop(rng.randrange(len(target))))
+        assert len(sort_outliner.plan_reorder(current, target)) <= 1
+
+
+def test_plan_reorder_is_minimal():
+    rng = random.Random(2)
+    for _ in range(100):
+        current = ['node{}'.format(i) for i in range(rng.randint(1, 40))]
+        target = list(current)
+        rng.shuffle(target)
+        positions = [target.index(name) for name in current]
+        keep = sort_outliner.longest_increasing_subsequence(positions)
+        assert len(sort_outliner.plan_reorder(current, target)) == len(current) - len(keep)
+
+
+def test_index_snapshot_matches_bulk_queries(monkeypatch):
+    cmds = fakemaya.FakeCmds(fakemaya.FakeScene())
+    monkeypatch.setattr(scene, 'cmds', cmds.module())
+    monkeypatch.setattr(sort_outliner, 'cmds', cmds.module())
+    monkeypatch.setattr(scene, 'api', fakemaya.make_openmaya(cmds))
+    monkeypatch.setattr(scene, '_index', scene.SceneIndex())
+
+    for i, shape_type in enumerate(['mesh', None, 'camera', 'locator'] * 10):
+        node = cmds.scene.create('node{}'.format(39 - i))
+        if shape_type is not None:
+            cmds.scene.create('node{}Shape'.format(39 - i), shape_type, node)
+
+    bulk = sort_outliner.snapshot_assemblies()
+    scene.get_index()
+    assert scene.current_index() is not None
+    assert sort_outliner.snapshot_assemblies() == bulk
+
+    # Assemblies the index cannot resolve send it to the bulk queries.
+    scene._index.types.pop(bulk.names[3])
+    assert sort_outliner.snapshot_assemblies() == bulk
+
+
+def test_ruleset_cache_is_capped():
+    ruleset = sort_outliner.Ruleset(max_cached=10)
+    items = [sort_outliner.OutlinerItem('|node{}'.format(i), 'transform') for i in range(25)]
+    ruleset.order({'group': items})
+    assert len(ruleset._keys) <= 10
+    assert ruleset.order({'group': items[:3]}) == ['|node0', '|node1', '|node2']
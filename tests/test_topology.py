@@ -0,0 +1,55 @@
+import numpy as np
+
+from mamtools import topology
+
+
+def grid(side):
+    corner = (np.arange(side - 1)[:, None] * side + np.arange(side - 1)).ravel()
+    connects = np.c_[corner, corner + 1, corner + side + 1, corner + side].ravel()
+    return topology.Topology(np.full(len(corner), 4), connects)
+
+
+def find_edge(mesh_topology, a, b):
+    pairs = np.sort(mesh_topology.edge_vertices, axis=1)
+    return np.flatnonzero((pairs == sorted([a, b])).all(axis=1))[0]
+
+
+def test_face_groups_border_loop():
+    mesh_topology = grid(4)
+    faces, groups = mesh_topology.face_groups([8, 0, 1, 3, 4])
+    assert faces.tolist() == [0, 1, 3, 4, 8]
+    assert groups.tolist() == [0, 0, 0, 0, 1]
+
+    edge_groups, edges, shared = mesh_topology.group_edges(faces, groups)
+    border = (edge_groups == 0) & (shared == 1)
+    assert border.sum() == 8 and ((edge_groups == 0) & (shared == 2)).sum() == 4
+
+    (loop, closed), = topology.order_loops(mesh_topology.edge_vertices[edges[border]])
+    assert closed
+    assert sorted(loop.tolist()) == [0, 1, 2, 4, 6, 8, 9, 10]
+
+
+def test_order_loops_chains():
+    loops = topology.order_loops([[2, 1], [5, 6], [0, 1]])
+    assert [(v.tolist(), closed) for v, closed in loops] == [([0, 1, 2], False), ([5, 6], False)]
+
+
+def test_loop_continuation():
+    mesh_topology = grid(4)
+    edge = find_edge(mesh_topology, 4, 5)
+    following = mesh_topology.loop_continuation(5, edge)
+    assert sorted(mesh_topology.edge_vertices[following].tolist()) == [5, 6]
+    # Vertex 4 is on the border, there is nothing to continue to.
+    assert mesh_topology.loop_continuation(4, edge) == -1
+
+
+def test_nbytes_budgets_lazy_edges():
+    mesh_topology = grid(20)
+    estimate = mesh_topology.nbytes
+    mesh_topology.face_edges
+    assert estimate >= mesh_topology.nbytes
+
+    cache = topology.TopologyCache(max_mb=estimate * 1.5 / (1024 * 1024))
+    cache.put('a', None, grid(20))
+    cache.put('b', None, grid(20))
+    assert 'a' not in cache and 'b' in cache